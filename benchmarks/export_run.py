@@ -0,0 +1,258 @@
+"""Run an export end to end against a synthetic database and time each of its stages.
+
+The database is served from memory by `fake_rpc`, with an optional simulated latency per RPC call, so that the
+measures only depend on the plugin. Stages are timed by wrapping the methods running them, the time of a stage
+includes the time of the stages it runs (the conversion of a record resolving XML IDs over RPC, the write of
+a file formatting it) and is summed over all threads when running with `--jobs`.
+
+With `--cache`, the export runs with the metadata and format caches, warmed up by a first run left out
+of the measures, to measure the exports following a first one.
+
+Results are compared to a baseline, kept per size in a JSON file, the benchmark fails if a stage got slower
+than its baseline by more than the tolerance.
+
+Usage: python benchmarks/export_run.py [--size 1000 10000] [--repeat 3] [--jobs 1] [--workers 1] [--latency 0]
+           [--formatter black] [--cache] [--baseline benchmarks/export_baseline.json] [--save-baseline] [--tolerance 0.2]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Tuple,
+)
+
+from fake_rpc import FakeDatabase, generate
+
+
+EXPORTED_MODELS = ["ir.model", "ir.ui.view", "res.groups", "ir.model.access"]
+
+DEFAULT_BASELINE = Path(__file__).parent / "export_baseline.json"
+
+# Stages slower than their baseline by less than this many seconds are ignored, as noise
+NOISE_FLOOR = 0.05
+
+
+class StageTimer:
+    """Cumulative time spent in each stage of an export, measured by wrapping the methods running the stages."""
+
+    def __init__(self) -> None:
+        self.times: Dict[str, float] = {}
+        self._patches: List[Tuple[Any, str, Any]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def wrap(self, owner: Any, name: str, stage: str) -> None:
+        """Time the calls of a method, along with the iteration of the generator it returns if any.
+        :param owner: The class of the method
+        :param name: The name of the method
+        :param stage: The stage the method is timed under
+        """
+        method = getattr(owner, name)
+        timer = self
+
+        def wrapper(*args, **kwargs):
+            with timer.measure(stage):
+                result = method(*args, **kwargs)
+
+            if isinstance(result, Iterator):
+                return timer._iterate(stage, result)
+
+            return result
+
+        self._patches.append((owner, name, method))
+        setattr(owner, name, wrapper)
+
+    def restore(self) -> None:
+        """Restore the wrapped methods."""
+        for owner, name, method in reversed(self._patches):
+            setattr(owner, name, method)
+
+        self._patches = []
+
+    @contextmanager
+    def measure(self, stage: str) -> Generator[None, None, None]:
+        """Time a block of code, nested blocks of the same stage in the same thread being counted once."""
+        depths = self._local.__dict__.setdefault("depths", {})
+        depths[stage] = depths.get(stage, 0) + 1
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            depths[stage] -= 1
+
+            if not depths[stage]:
+                with self._lock:
+                    self.times[stage] = self.times.get(stage, 0.0) + time.perf_counter() - start
+
+    def _iterate(self, stage: str, iterator: Iterator[Any]) -> Generator[Any, None, None]:
+        while True:
+            with self.measure(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+
+            yield item
+
+
+def build_command(database: FakeDatabase, path: Path, args: Namespace) -> Any:
+    """Instantiate the export command on the synthetic database, without going through the odev CLI."""
+    from odev.plugins.odev_plugin_export.commands.export import ExportCommand
+    from odev.plugins.odev_plugin_export.common.odoo import DEFAULT_MODULE_LIST
+
+    command = ExportCommand.__new__(ExportCommand)
+    command.args = Namespace(
+        model=",".join(EXPORTED_MODELS),
+        domain=None,
+        fields=None,
+        format="xml",
+        modules=list(DEFAULT_MODULE_LIST),
+        export_config=None,
+        importable=False,
+        no_migrate_code=False,
+        path=path,
+        version=str(database.version),
+        jobs=args.jobs,
+        no_cache=not args.cache,
+        refresh_cache=False,
+        chunk_size=500,
+        formatter=args.formatter,
+        stream_xml=False,
+        incremental=False,
+        workers=args.workers,
+        profile=None,
+        profile_calls=False,
+        trace_rpc=False,
+        rpc_budget=None,
+    )
+    command._database = database
+    # Connections added to the pool with `--jobs` are opened on the synthetic database as well
+    command._ExportCommand__connect = lambda: database.models
+    command.export_config = command._ExportCommand__load_config()
+
+    return command
+
+
+def instrument(timer: StageTimer) -> None:
+    """Wrap the methods running each stage of an export."""
+    from odev.plugins.odev_plugin_export.commands.export import ExportCommand
+    from odev.plugins.odev_plugin_export.common.converters.converter_factory import ConverterFactory
+    from odev.plugins.odev_plugin_export.common.formatter import Formatter
+    from odev.plugins.odev_plugin_export.common.merge.merge_buffer import MergeBuffer
+    from odev.plugins.odev_plugin_export.common.merge.merge_factory import MergeFactory
+    from odev.plugins.odev_plugin_export.common.render import RenderPool
+
+    timer.wrap(ExportCommand, "_ExportCommand__load_xml_ids", "xml_ids")
+    timer.wrap(ExportCommand, "_ExportCommand__get_records", "fetch")
+    timer.wrap(ConverterFactory, "convert", "convert")
+    timer.wrap(RenderPool, "convert", "convert")
+    timer.wrap(MergeFactory, "merge", "merge")
+    timer.wrap(Formatter, "format", "format")
+    timer.wrap(MergeBuffer, "flush", "write")
+
+
+def run(size: int, args: Namespace) -> Dict[str, Any]:
+    """Export a synthetic database of a given size.
+    :return: The total time of the export, the time of each stage and the number of RPC calls
+    """
+    database = FakeDatabase(generate(size), latency=args.latency)
+    timer = StageTimer()
+    instrument(timer)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="odev-export-bench-") as path:
+            command = build_command(database, Path(path), args)
+            start = time.perf_counter()
+            command.run()
+            total = time.perf_counter() - start
+    finally:
+        timer.restore()
+
+    return {"total": total, "stages": {**timer.times, "rpc": database.rpc_time}, "rpc_calls": database.calls}
+
+
+def median(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stages = sorted({stage for result in results for stage in result["stages"]})
+
+    return {
+        "total": statistics.median(result["total"] for result in results),
+        "stages": {
+            stage: statistics.median(result["stages"].get(stage, 0.0) for result in results) for stage in stages
+        },
+        "rpc_calls": results[0]["rpc_calls"],
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List the stages slower than their baseline by more than the tolerance."""
+    regressions = []
+    timings = {"total": result["total"], **result["stages"]}
+    baseline_timings = {"total": baseline["total"], **baseline["stages"]}
+
+    for stage, timing in timings.items():
+        reference = baseline_timings.get(stage)
+
+        if reference is not None and timing > reference * (1 + tolerance) and timing - reference > NOISE_FLOOR:
+            regressions.append(f"{stage}: {timing:.2f} s, baseline {reference:.2f} s (+{timing / reference - 1:.0%})")
+
+    if result["rpc_calls"] > baseline.get("rpc_calls", result["rpc_calls"]):
+        regressions.append(f"rpc_calls: {result['rpc_calls']}, baseline {baseline['rpc_calls']}")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, nargs="+", default=[1000, 10000], help="Number of records of the dataset")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs per size, the median is reported")
+    parser.add_argument("--jobs", type=int, default=1, help="Value of the --jobs option of the export")
+    parser.add_argument("--workers", type=int, default=1, help="Value of the --workers option of the export")
+    parser.add_argument("--formatter", default="black", help="Value of the --formatter option of the export")
+    parser.add_argument("--cache", action="store_true", help="Run with the caches, warmed up by a first run")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated latency of each RPC call, in seconds")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="The file of the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown allowed over the baseline")
+    args = parser.parse_args()
+
+    baselines: Dict[str, Any] = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    failed = False
+
+    for size in args.size:
+        if args.cache:
+            run(size, args)
+
+        result = median([run(size, args) for _ in range(args.repeat)])
+        stages = ", ".join(f"{stage} {timing:.2f} s" for stage, timing in result["stages"].items())
+        print(f"{size} records: {result['total']:.2f} s ({stages}), {result['rpc_calls']} RPC calls")
+
+        if args.save_baseline:
+            baselines[str(size)] = result
+        elif str(size) in baselines:
+            for regression in compare(result, baselines[str(size)], args.tolerance):
+                print(f"  Regression on {regression}")
+                failed = True
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(baselines, indent=4) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""Synthetic stand-in for the RPC connector of an Odoo database, serving generated datasets from memory.
+
+The dataset holds Studio-like customizations: custom models with their fields and selection values, views,
+groups and access rights, half of them having an XML ID in `studio_customization`. Records are generated
+deterministically from the requested size, so that runs of the benchmarks are comparable.
+"""
+
+import random
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Sequence,
+)
+
+
+WRITE_DATE = "2024-01-01 00:00:00"
+
+# Share of the records of the dataset generated for each model, `ir.model.data` records come on top
+SHARES = {
+    "ir.model": 0.01,
+    "ir.model.fields": 0.19,
+    "ir.ui.view": 0.2,
+    "res.groups": 0.05,
+    "ir.model.access": 0.55,
+}
+
+FIELD_TYPES = ["char", "integer", "boolean", "many2one", "selection", "text", "float", "date"]
+
+FIELDS_GET: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "ir.model": {
+        "id": {"type": "integer"},
+        "model": {"type": "char"},
+        "name": {"type": "char"},
+        "state": {"type": "selection"},
+        "info": {"type": "text"},
+        "write_date": {"type": "datetime"},
+    },
+    "ir.model.fields": {
+        "id": {"type": "integer"},
+        "name": {"type": "char"},
+        "ttype": {"type": "selection"},
+        "model_id": {"type": "many2one", "relation": "ir.model"},
+        "complete_name": {"type": "char"},
+        "relation": {"type": "char"},
+        "required": {"type": "boolean"},
+        "index": {"type": "boolean"},
+        "copied": {"type": "boolean"},
+        "translate": {"type": "boolean"},
+        "depends": {"type": "char"},
+        "related": {"type": "char"},
+        "compute": {"type": "text"},
+        "relation_field": {"type": "char"},
+        "field_description": {"type": "char"},
+        "store": {"type": "boolean"},
+        "readonly": {"type": "boolean"},
+        "model": {"type": "char"},
+        "state": {"type": "selection"},
+        "selection_ids": {"type": "one2many", "relation": "ir.model.fields.selection"},
+        "write_date": {"type": "datetime"},
+    },
+    "ir.model.fields.selection": {
+        "id": {"type": "integer"},
+        "display_name": {"type": "char"},
+        "value": {"type": "char"},
+        "field_id": {"type": "many2one", "relation": "ir.model.fields"},
+        "sequence": {"type": "integer"},
+        "write_date": {"type": "datetime"},
+    },
+    "ir.ui.view": {
+        "id": {"type": "integer"},
+        "name": {"type": "char"},
+        "model": {"type": "char"},
+        "inherit_id": {"type": "many2one", "relation": "ir.ui.view"},
+        "mode": {"type": "selection"},
+        "arch": {"type": "text"},
+        "write_date": {"type": "datetime"},
+    },
+    "res.groups": {
+        "id": {"type": "integer"},
+        "name": {"type": "char"},
+        "display_name": {"type": "char"},
+        "comment": {"type": "text"},
+        "category_id": {"type": "many2one", "relation": "ir.module.category"},
+        "implied_ids": {"type": "many2many", "relation": "res.groups"},
+        "users": {"type": "many2many", "relation": "res.users"},
+        "write_date": {"type": "datetime"},
+    },
+    "ir.model.access": {
+        "id": {"type": "integer"},
+        "name": {"type": "char"},
+        "model_id": {"type": "many2one", "relation": "ir.model"},
+        "group_id": {"type": "many2one", "relation": "res.groups"},
+        "perm_read": {"type": "boolean"},
+        "perm_write": {"type": "boolean"},
+        "perm_create": {"type": "boolean"},
+        "perm_unlink": {"type": "boolean"},
+        "write_date": {"type": "datetime"},
+    },
+}
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+
+def generate(size: int, xml_id_ratio: float = 0.5, seed: int = 0) -> Dict[str, List[dict]]:
+    """Generate the records of a synthetic database.
+    :param size: The approximate number of records, `ir.model.data` excluded
+    :param xml_id_ratio: The share of the records having an XML ID
+    :param seed: The seed of the generator
+    :return: The records, by model
+    """
+    rng = random.Random(seed)
+    counts = {model: max(1, int(size * share)) for model, share in SHARES.items()}
+    tables: Dict[str, List[dict]] = {model: [] for model in [*SHARES, "ir.model.fields.selection", "ir.model.data"]}
+
+    for index in range(counts["ir.model"]):
+        tables["ir.model"].append(
+            {"model": f"x_bench_model_{index}", "name": f"Bench Model {index}", "state": "manual", "info": ""}
+        )
+
+    for index in range(counts["ir.model.fields"]):
+        model_id = index % counts["ir.model"] + 1
+        ttype = FIELD_TYPES[index % len(FIELD_TYPES)]
+        field: Dict[str, Any] = {
+            "name": f"x_studio_field_{index}",
+            "ttype": ttype,
+            "model_id": model_id,
+            "model": f"x_bench_model_{model_id - 1}",
+            "complete_name": f"Field {index}",
+            "field_description": f"Field {index}",
+            "relation": "res.partner" if ttype == "many2one" else False,
+            "required": rng.random() < 0.1,
+            "index": False,
+            "copied": True,
+            "translate": False,
+            "depends": "",
+            "related": "",
+            "compute": "",
+            "relation_field": "",
+            "store": True,
+            "readonly": False,
+            "state": "manual",
+            "selection_ids": [],
+        }
+
+        if ttype == "selection":
+            for value in range(3):
+                selection = {"display_name": f"Value {value}", "value": f"value_{value}", "sequence": value}
+                tables["ir.model.fields.selection"].append({**selection, "field_id": index + 1})
+                field["selection_ids"].append(len(tables["ir.model.fields.selection"]))
+
+        tables["ir.model.fields"].append(field)
+
+    for index in range(counts["ir.ui.view"]):
+        model = f"x_bench_model_{index % counts['ir.model']}"
+        field_name = f"x_studio_field_{index % counts['ir.model.fields']}"
+
+        if index and rng.random() < 0.5:
+            inherit_id = rng.randint(1, index)
+            xpath = '<xpath expr="//field[@name=\'name\']" position="after">'
+            arch = f'<data>{xpath}<field name="{field_name}"/></xpath></data>'
+        else:
+            inherit_id = False
+            arch = f'<form><sheet><group><field name="name"/><field name="{field_name}"/></group></sheet></form>'
+
+        tables["ir.ui.view"].append(
+            {
+                "name": f"{model} view {index}",
+                "model": model,
+                "inherit_id": inherit_id,
+                "mode": "extension" if inherit_id else "primary",
+                "arch": arch,
+            }
+        )
+
+    for index in range(counts["res.groups"]):
+        implied = sorted(rng.sample(range(1, index + 1), min(index, 2))) if index else []
+        tables["res.groups"].append(
+            {
+                "name": f"Bench Group {index}",
+                "display_name": f"Bench / Group {index}",
+                "comment": "",
+                "category_id": False,
+                "implied_ids": implied,
+                "users": sorted(rng.sample(range(1, 50), 3)),
+            }
+        )
+
+    for index in range(counts["ir.model.access"]):
+        model_id = index % counts["ir.model"] + 1
+        tables["ir.model.access"].append(
+            {
+                "name": f"access_x_bench_model_{model_id - 1}_{index}",
+                "model_id": model_id,
+                "group_id": index % counts["res.groups"] + 1,
+                "perm_read": True,
+                "perm_write": rng.random() < 0.5,
+                "perm_create": rng.random() < 0.5,
+                "perm_unlink": rng.random() < 0.2,
+            }
+        )
+
+    for model, records in tables.items():
+        for index, record in enumerate(records, start=1):
+            record.setdefault("id", index)
+            record.setdefault("write_date", WRITE_DATE)
+
+            if model in SHARES and rng.random() < xml_id_ratio:
+                tables["ir.model.data"].append(
+                    {
+                        "id": len(tables["ir.model.data"]) + 1,
+                        "module": "studio_customization",
+                        "name": f"{model.replace('.', '_')}_{index}",
+                        "model": model,
+                        "res_id": index,
+                        "noupdate": False,
+                    }
+                )
+
+    return tables
+
+
+class FakeModel:
+    """RPC proxy of a model of the synthetic database."""
+
+    def __init__(self, database: "FakeDatabase", model: str) -> None:
+        self.database = database
+        self.model = model
+        self.records = database.tables.get(model, [])
+
+    def search_read(
+        self,
+        domain: Sequence = (),
+        fields: Sequence[str] = None,
+        order: str = None,
+        limit: int = None,
+        offset: int = 0,
+    ) -> List[dict]:
+        # Values of `in` operators are matched against sets, ids being looked up by batches of thousands
+        domain = [
+            (term[0], term[1], set(term[2]) if term[1] in ("in", "not in") else term[2])
+            if not isinstance(term, str)
+            else term
+            for term in domain
+        ]
+
+        def read():
+            records = [record for record in self.records if self._match(record, domain)]
+
+            for part in reversed([part.split() for part in (order or "id").split(",")]):
+                records.sort(key=lambda r: (r.get(part[0]) is None, r.get(part[0])), reverse=part[-1] == "desc")
+
+            records = records[offset : offset + limit if limit else None]
+            names = list(dict.fromkeys(["id", *(fields or FIELDS_GET.get(self.model, {}).keys())]))
+            return [{name: self._copy(record.get(name, False)) for name in names} for record in records]
+
+        return self.database.call(read)
+
+    def search_count(self, domain: Sequence = (), *args, **kwargs) -> int:
+        return len(self.search_read(domain, fields=["id"]))
+
+    def fields_get(self, *args, **kwargs) -> Dict[str, Dict[str, Any]]:
+        return self.database.call(lambda: {name: dict(field) for name, field in FIELDS_GET.get(self.model, {}).items()})
+
+    def default_get(self, fields: Sequence[str], *args, **kwargs) -> Dict[str, Any]:
+        return self.database.call(lambda: {})
+
+    def _match(self, record: dict, domain: Sequence) -> bool:
+        for term in domain:
+            if isinstance(term, str):
+                if term != "&":
+                    raise NotImplementedError(f"Unsupported domain operator {term}")
+
+                continue
+
+            field, operator, value = term
+
+            if not OPERATORS[operator](record.get(field, False), value):
+                return False
+
+        return True
+
+    def _copy(self, value: Any) -> Any:
+        return list(value) if isinstance(value, list) else value
+
+
+class FakeModels:
+    """Mapping of model names to RPC proxies of the synthetic database, as the `models` of a database."""
+
+    def __init__(self, database: "FakeDatabase") -> None:
+        self.database = database
+
+    def __getitem__(self, model: str) -> FakeModel:
+        return FakeModel(self.database, model)
+
+
+class FakeDatabase:
+    """Synthetic database standing for `DatabaseCommand._database`, counting the RPC calls made to it."""
+
+    def __init__(
+        self, tables: Dict[str, List[dict]], name: str = "bench", version: Any = "17.0", latency: float = 0.0
+    ) -> None:
+        """Initialize the database.
+        :param tables: The records of the database, by model
+        :param name: The name of the database
+        :param version: The version of the database
+        :param latency: The simulated network latency of each RPC call, in seconds
+        """
+        self.tables = tables
+        self.name = name
+        self.version = version
+        self.latency = latency
+        self.calls = 0
+        self.rpc_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def models(self) -> FakeModels:
+        return FakeModels(self)
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        """Run an RPC call, after the simulated latency."""
+        start = time.perf_counter()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        result = func()
+
+        with self._lock:
+            self.calls += 1
+            self.rpc_time += time.perf_counter() - start
+
+        return result
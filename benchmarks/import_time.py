@@ -0,0 +1,74 @@
+"""Measure the time needed to import the export command, paid by every odev invocation loading the plugin.
+
+Heavy dependencies (black, isort, lxml.etree, astunparse, yaml) must only be imported once an export needs them,
+the benchmark fails if any of them is loaded by the import of the command.
+
+Usage: python benchmarks/import_time.py [--repeat 10] [--module odev.plugins.odev_plugin_export.commands.export]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+HEAVY_MODULES = ["black", "isort", "lxml.etree", "astunparse", "yaml"]
+
+COMMAND_MODULE = "odev.plugins.odev_plugin_export.commands.export"
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """Import a module in a fresh interpreter.
+    :param module: The module to import
+    :return: The cumulative import time of the module in milliseconds and the heavy modules it loaded
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines look like "import time:      1234 |      5678 | odev.plugins.odev_plugin_export.commands.export"
+    cumulative = 0
+    for line in process.stderr.splitlines():
+        parts = [part.strip() for part in line.removeprefix("import time:").split("|")]
+
+        if len(parts) == 3 and parts[2] == module:
+            cumulative = int(parts[1])
+
+    return cumulative / 1000, [name for name in process.stdout.strip().split(",") if name]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Number of measures, the median is reported")
+    parser.add_argument("--module", default=COMMAND_MODULE, help="The module to import")
+    args = parser.parse_args()
+
+    timings = []
+    loaded: List[str] = []
+
+    for _ in range(args.repeat):
+        timing, loaded = measure(args.module)
+        timings.append(timing)
+
+    print(
+        f"{args.module}: median {statistics.median(timings):.1f} ms, min {min(timings):.1f} ms over {args.repeat} runs"
+    )
+
+    for name in HEAVY_MODULES:
+        baseline, _ = measure(name)
+        print(f"  {name}: {baseline:.1f} ms if imported eagerly")
+
+    if loaded:
+        print(f"Heavy modules imported eagerly: {', '.join(loaded)}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
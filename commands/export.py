@@ -1,39 +1,67 @@
 """Export data from a database."""
 
 import ast
-import copy
+import hashlib
 import os
 import shutil
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from itertools import chain
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Dict,
+    Generator,
+    Iterable,
+    Iterator,
     List,
     Optional,
+    Set,
+    Tuple,
     Union,
 )
 
-import black
-import yaml
-
 from odev.common import args, progress
 from odev.common.commands import DatabaseCommand
-from odev.common.connectors.rpc import ConnectorError
+from odev.common.connectors.rpc import ConnectorError, FieldsGetMapping, RpcConnector
 from odev.common.logging import logging
 from odev.common.odoobin import OdoobinProcess
 from odev.common.version import OdooVersion
 
-from odev.plugins.odev_plugin_export.common.converters.converter_base import ConverterBase
+from odev.plugins.odev_plugin_export.common.cache import DEFAULT_CACHE_PATH, MetadataCache, RecordCache
 from odev.plugins.odev_plugin_export.common.converters.converter_factory import ConverterFactory
-from odev.plugins.odev_plugin_export.common.converters.converter_python import ConverterPython
+from odev.plugins.odev_plugin_export.common.fetcher import RecordFetcher
+from odev.plugins.odev_plugin_export.common.formatter import FORMATTERS, FormatCache, Formatter
+from odev.plugins.odev_plugin_export.common.fragments import Fragment
 from odev.plugins.odev_plugin_export.common.merge.merge_factory import MergeFactory
-from odev.plugins.odev_plugin_export.common.odoo import DEFAULT_MODULE_LIST, get_xml_ids
+from odev.plugins.odev_plugin_export.common.odoo import (
+    DEFAULT_MODULE_LIST,
+    XML_ID_FIELDS,
+    RenameMap,
+    XmlIdRegistry,
+    search_read_paginated,
+)
+from odev.plugins.odev_plugin_export.common.pool import BackgroundIterator, ConnectionPool
+from odev.plugins.odev_plugin_export.common.profiler import ExportProfiler
+from odev.plugins.odev_plugin_export.common.render import RenderPool
+from odev.plugins.odev_plugin_export.common.scheduler import ExportScheduler
+from odev.plugins.odev_plugin_export.common.state import ExportState
+from odev.plugins.odev_plugin_export.common.tracer import RpcBudgetExceeded, RpcTracer
 
 
 logger = logging.getLogger(__name__)
 
+XML_IDS_PAGE_SIZE = 10000
+
+# Number of records of a chunk, models and fields renamed by its `ir.model` records and its converted records
+RenderedChunk = Tuple[
+    int, List[Tuple[int, List[tuple[str, str]], List[tuple[str, str, str]]]], Iterable[Tuple[dict, Fragment]]
+]
+
 
 class ExportCommand(DatabaseCommand):
     """Export data from a database."""
@@ -85,6 +113,65 @@ class ExportCommand(DatabaseCommand):
         description="Target version of the export template.",
         default="master",
     )
+    jobs = args.Integer(
+        aliases=["-j", "--jobs"],
+        description="Number of models fetched and converted concurrently, over as many RPC connections.",
+        default=1,
+    )
+    no_cache = args.Flag(
+        aliases=["--no-cache"],
+        description="Do not read nor write the metadata cache of the database.",
+        default=False,
+    )
+    refresh_cache = args.Flag(
+        aliases=["--refresh-cache"],
+        description="Ignore the metadata cache of the database and rebuild it.",
+        default=False,
+    )
+    chunk_size = args.Integer(
+        aliases=["--chunk-size"],
+        description="Initial number of records fetched per call, adjusted to the response time of the database.",
+        default=500,
+    )
+    formatter = args.String(
+        aliases=["--formatter"],
+        description="How generated Python files are formatted: with black, fast whitespace normalization or not at all.",
+        choices=FORMATTERS,
+        default="black",
+    )
+    stream_xml = args.Flag(
+        aliases=["--stream-xml"],
+        description="Write new XML files incrementally instead of keeping them in memory, for large data files.",
+        default=False,
+    )
+    incremental = args.Flag(
+        aliases=["--incremental"],
+        description="Only export the records changed since the last export to the same path.",
+        default=False,
+    )
+    workers = args.Integer(
+        aliases=["--workers"],
+        description="Number of processes records are converted to code in.",
+        default=1,
+    )
+    profile = args.Path(
+        aliases=["--profile"],
+        description="Write the time, RPC payload and memory spent in each stage of the export to this JSON report.",
+    )
+    profile_calls = args.Flag(
+        aliases=["--profile-calls"],
+        description="With --profile, also dump the cProfile statistics of the slowest model next to the report.",
+        default=False,
+    )
+    trace_rpc = args.Flag(
+        aliases=["--trace-rpc"],
+        description="Log every RPC call, then the repeated calls and the calls issued in loops (N+1).",
+        default=False,
+    )
+    rpc_budget = args.Integer(
+        aliases=["--rpc-budget"],
+        description="Fail the export once it made more RPC calls than this, reporting the calls issued in loops.",
+    )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -98,8 +185,10 @@ class ExportCommand(DatabaseCommand):
                     f"Path {self.args.path.as_posix()} already exist and doesn't seem to be an Odoo module path"
                 )
 
-            if len(list(self.args.path.iterdir())) and self.console.confirm(
-                f"The folder {self.args.path} already exist do you want to delete first ?"
+            if (
+                not self.args.incremental
+                and len(list(self.args.path.iterdir()))
+                and self.console.confirm(f"The folder {self.args.path} already exist do you want to delete first ?")
             ):
                 logger.warning(f"Existing folder '{self.args.path}' successfully deleted")
                 shutil.rmtree(self.args.path)
@@ -111,14 +200,76 @@ class ExportCommand(DatabaseCommand):
         self.export_config = self.__load_config()
 
     def run(self):
-        self.xml_ids, ids_to_export = self.__load_xml_ids(self.export_config.keys())
+        self.profiler = ExportProfiler(enabled=self.args.profile is not None, profile_calls=self.args.profile_calls)
+        self.profiler.start()
+        self.pool = ConnectionPool(
+            self.__connect, size=self.args.jobs + 1 if self.args.jobs > 1 else 1, connections=[self._database.models]
+        )
+        self.tracer = RpcTracer(log_calls=self.args.trace_rpc, budget=self.args.rpc_budget)
+        self.models = self.tracer.wrap(self.profiler.rpc(self.pool.models))
+        self.cache = MetadataCache(
+            self._database.name,
+            str(self._database.version),
+            enabled=not self.args.no_cache,
+            refresh=self.args.refresh_cache,
+        )
 
+        if self.cache.enabled:
+            self.cache.validate(self.__cache_tokens())
+
+        self.fetcher = RecordFetcher(self.models, batch_size=self.args.chunk_size, cache=RecordCache())
+        self.executor = (
+            ThreadPoolExecutor(max_workers=self.args.jobs, thread_name_prefix="export") if self.args.jobs > 1 else None
+        )
+        self.scheduler = ExportScheduler(self.args.jobs) if self.args.jobs > 1 else None
+        self.renderer: Optional[RenderPool] = None
+
+        try:
+            self.__export_modules()
+        except RpcBudgetExceeded as error:
+            raise self.error(str(error)) from error
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+
+            if self.renderer is not None:
+                self.renderer.shutdown()
+
+            self.tracer.report()
+            self.profiler.report(self.args.profile)
+
+    def __export_modules(self):
+        with self.profiler.stage("xml_ids"):
+            self.xml_ids, ids_to_export = self.__load_xml_ids(self.export_config.keys())
+
+        self.formatter = Formatter(
+            self.args.formatter,
+            cache=FormatCache(path=DEFAULT_CACHE_PATH / "format.json" if self.cache.enabled else None),
+        )
+        self.formatter.format = self.profiler.wrap("format", self.formatter.format)  # type: ignore
+
+        self.depends: Dict[str, Set[str]] = defaultdict(set)
+        self.renames = RenameMap()
         self.converter = ConverterFactory(
-            version=OdooVersion(self.args.version), xml_ids=self.xml_ids, migrate_code=not self.args.no_migrate_code
+            version=OdooVersion(self.args.version),
+            xml_ids=self.xml_ids,
+            migrate_code=not self.args.no_migrate_code,
+            formatter=self.formatter,
+            depends=self.depends,
+            renames=self.renames,
         )
 
+        if self.args.workers > 1:
+            self.renderer = RenderPool(self.args.workers, self.converter, self.args.version)
+
+        from odev.plugins.odev_plugin_export.common.converters.converter_python import ConverterPython
+
         self.converter_py = ConverterPython(
-            version=OdooVersion(self.args.version), xml_ids=self.xml_ids, migrate_code=not self.args.no_migrate_code
+            version=OdooVersion(self.args.version),
+            xml_ids=self.xml_ids,
+            migrate_code=not self.args.no_migrate_code,
+            formatter=self.formatter,
+            renames=self.renames,
         )
 
         # TODO: Add prettify argument as before
@@ -128,22 +279,237 @@ class ExportCommand(DatabaseCommand):
             path=self.args.path,
             prettify=True,
             migrate_code=not self.args.no_migrate_code,
+            formatter=self.formatter,
+            stream_xml=self.args.stream_xml,
         )
 
-        for module, data in ids_to_export.items():
-            ConverterBase.depends = []
-            logger.info(f"Exporting '{module}' module to {Path(self.args.path / module)}")
-            for model in data.keys():
-                config = self.export_config[model]
-                if not config.get("export", True):
-                    continue
+        self.states: Dict[str, ExportState] = {}
+        self.display_lock = threading.Lock()
+        self.tracker: Optional[progress.Progress] = None
+        modules = list(ids_to_export.items())
+
+        if self.scheduler is None or len(modules) < 2:
+            for module, data in modules:
+                self.__export_module(module, data)
+        else:
+            # Modules only share the output buffer and the registry of XML IDs, they are exported in parallel
+            with ThreadPoolExecutor(max_workers=len(modules), thread_name_prefix="export-module") as executor:
+                list(executor.map(lambda item: self.__export_module(*item), modules))
+
+        self.fetcher.report()
+
+        # A snapshot restored from the cache is not written back, which would postpone its expiry
+        if not self.xml_ids_cached:
+            self.cache.set("ir.model.data", self.xml_ids_cache_key, self.xml_ids.snapshot())
+
+        self.formatter.cache.save()
+        self.cache.evict()
+
+    def __export_module(self, module: str, data: Dict[str, List[int]]):
+        """Export the records of a module, then generate its manifest.
+        :param module: The module to export
+        :param data: The ids of the records to export, by model
+        """
+        logger.info(f"Exporting '{module}' module to {Path(self.args.path / module)}")
+        models = [(model, ids) for model, ids in data.items() if ids and self.export_config[model].get("export", True)]
+
+        if self.args.incremental:
+            models = self.__diff_state(module, models)
+
+        if self.scheduler is None:
+            for model, ids in models:
+                self.export(module, model, ids)
+        else:
+            for model, ids, rendered in self.__schedule_models(module, models):
+                with self.profiler.model(module, model):
+                    self.__commit(module, model, ids, rendered)
+
+        with self.profiler.stage("write", module):
+            self.merge.flush(module)
+
+        if module in self.states:
+            self.states[module].depends = sorted(self.depends[module])
+            self.states[module].save()
+
+        if Path(self.args.path / module).exists():
+            self.__generate_init_files(module)
+            self.__generate_manifest(module)
+
+    def __connect(self) -> RpcConnector:
+        """Open a new RPC connection to the database, used to grow the connection pool."""
+        connector = RpcConnector(self._database)
+        connector.connect()
+        return connector
+
+    def __cache_tokens(self) -> Dict[str, str]:
+        """Compute the validation tokens of the metadata cache from the last update of the records
+        the cached metadata derives from, and from the number of XML IDs so that deleted XML IDs
+        invalidate the cached ones.
+        """
+
+        def last_update(model: str) -> str:
+            try:
+                records = self.models[model].search_read([], fields=["write_date"], order="write_date desc", limit=1)
+            except ConnectorError:
+                return ""
+
+            return str(records[0]["write_date"]) if records else ""
+
+        def count(model: str) -> str:
+            try:
+                return str(self.models[model].search_count([]))
+            except ConnectorError:
+                return ""
+
+        fields_token = f"{last_update('ir.module.module')}|{last_update('ir.model.fields')}"
+
+        return {
+            "fields_get": fields_token,
+            "default_get": f"{fields_token}|{last_update('ir.default')}",
+            "ir.model.data": f"{last_update('ir.model.data')}|{count('ir.model.data')}",
+        }
+
+    def __fields_get(self, model: str) -> FieldsGetMapping:
+        """Get the fields definition of a model, from the metadata cache if still valid."""
+        if (fields_get := self.cache.get("fields_get", model)) is None:
+            with self.profiler.stage("fields_get", model=model):
+                fields_get = self.models[model].fields_get()
+
+            self.cache.set("fields_get", model, fields_get)
+
+        return fields_get
+
+    def __default_get(self, model: str, fields: List[str]) -> dict:
+        """Get the default values of the fields of a model, from the metadata cache if still valid."""
+        if (default_get := self.cache.get("default_get", model)) is None:
+            with self.profiler.stage("default_get", model=model):
+                default_get = self.models[model].default_get(fields)
+
+            self.cache.set("default_get", model, default_get)
+
+        return default_get
+
+    def __map(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        """Map a function over an iterable, in the worker threads when running with `--jobs`."""
+        return self.executor.map(func, iterable) if self.executor is not None else map(func, iterable)
+
+    def __diff_state(self, module: str, models: List[Tuple[str, List[int]]]) -> List[Tuple[str, List[int]]]:
+        """Compare the records to export with the state of the last export of a module, remove the changed
+        and deleted records from their file and keep only the new and changed records to export.
+        :param module: The module to export
+        :param models: The models to export with the ids of their records
+        :return: The models with new or changed records, with the ids of these records
+        """
+        state = self.states[module] = ExportState(Path(self.args.path / module))
+        self.merge.buffer.add_written(state.files())
+        self.depends[module].update(state.depends)
+        changed_models = []
+
+        # The spinner is left out while the progress bars of other modules are displayed
+        with self.display_lock, (
+            progress.spinner(f"Comparing '{module}' records with the last export")
+            if self.tracker is None
+            else nullcontext()
+        ):
+            for model, ids in models:
+                versions = self.__record_versions(model, ids)
+                changed, deleted = state.diff(model, {id_: versions[id_] for id_ in ids if id_ in versions})
+
+                # XML records are replaced in place to keep the order of the file, other records are merged again
+                for entry in deleted + [e for e in state.previous[model].values() if not e["file"].endswith(".xml")]:
+                    if entry["file"]:
+                        self.merge.remove(module, entry["file"], entry["key"])
+
+                if changed:
+                    changed_models.append((model, changed))
+                elif model == "ir.model" and deleted:
+                    self.__generate_mig_script(module, *self.__state_renames(state))
+
+                logger.debug(f"{len(changed)} new or changed and {len(deleted)} deleted {model} records")
+
+        if model_names := [model for model, _ in changed_models]:
+            logger.info(f"Records changed since the last export: {', '.join(model_names)}")
+        else:
+            logger.info(f"No record changed since the last export of '{module}'")
+
+        return changed_models
+
+    def __record_versions(self, model: str, ids: List[Any], pk: str = "id") -> Dict[Any, str]:
+        """Compute the version of records from their last update and the last update of their included records,
+        without reading the records entirely.
+        :param model: The model of the records
+        :param ids: The values of the primary key of the records
+        :param pk: Name of the primary key table used to load records
+        :return: The version of the records, by value of their primary key
+        """
+        config = self.export_config[model]
+        includes = config.get("includes", {})
+        domain = ast.literal_eval(config.get("domain", "[]"))
+        fields = list(dict.fromkeys(["id", pk, "write_date"] + [inc["field"] for inc in includes.values()]))
+        records: List[dict] = []
+        batch_size = self.fetcher.get_batch_size(model)
+
+        for index in range(0, len(ids), batch_size):
+            records += self.models[model].search_read(
+                domain + [(pk, "in", ids[index : index + batch_size])], fields=fields
+            )
+
+        includes_versions = {
+            inc_model: self.__record_versions(
+                inc_model, list({r[inc["field"]] for r in records if r[inc["field"]]}), inc["inverse_name"]
+            )
+            for inc_model, inc in includes.items()
+        }
+
+        versions: Dict[Any, List[str]] = defaultdict(list)
+
+        for record in records:
+            parts = [str(record["id"]), str(record["write_date"])]
+            parts += [includes_versions[inc_model].get(record[inc["field"]], "") for inc_model, inc in includes.items()]
+            versions[record[pk]].append("|".join(parts))
+
+        return {key: hashlib.sha1("\n".join(sorted(parts)).encode()).hexdigest() for key, parts in versions.items()}
+
+    def __state_renames(self, state: ExportState) -> Tuple[List[tuple[str, str]], List[tuple[str, str, str]]]:
+        """Collect the models and fields renamed by all the `ir.model` records of an incremental export."""
+        renames = [entry["renames"] for entry in state.entries("ir.model") if "renames" in entry]
+        mapped_models = [tuple(m) for m in chain(*(models for models, _ in renames))]
+        mapped_fields = [tuple(f) for f in chain(*(fields for _, fields in renames))]
+
+        return mapped_models, mapped_fields  # type: ignore
+
+    def __schedule_models(
+        self, module: str, models: List[Tuple[str, List[int]]]
+    ) -> Generator[Tuple[str, List[int], Iterator[RenderedChunk]], None, None]:
+        """Render the models to export concurrently, following the dependencies between them, and yield them
+        in order to be merged on the main thread.
+        With `--jobs`, up to that many models are fetched and converted in worker threads, the next chunk
+        of records of a model being fetched while the current one is converted. Rendered chunks are handed
+        to the merge one at a time through a bounded queue, a model is never held in memory as a whole.
+        :param module: The module to export
+        :param models: The models to export with the ids of their records
+        :return: A generator of models, ids and rendered chunks of records
+        """
+        names = [model for model, _ in models]
+        ids_by_model = dict(models)
+        fields_get = dict(zip(names, self.__map(self.__fields_get, names)))
+        dependencies = ExportScheduler.dependencies(names, self.export_config, fields_get)
 
-                if ids := data.get(model, []):
-                    self.export(module, model, ids)
+        def render(model: str) -> Generator[RenderedChunk, None, None]:
+            # Each model fetches its chunks in its own thread, a fetch waiting for its chunks to be consumed
+            # never holds a worker needed by the model being merged
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="export-fetch") as executor:
+                chunks = BackgroundIterator(executor, partial(self.__get_chunks, module, model, ids_by_model[model]))
 
-            if Path(self.args.path / module).exists():
-                self.__generate_init_files(module)
-                self.__generate_manifest(module)
+                try:
+                    with self.profiler.model(module, model):
+                        for count, renames, converted in self.__render(module, model, chunks):  # type: ignore
+                            yield count, renames, list(converted)
+                finally:
+                    chunks.cancel()
+
+        for model, rendered in self.scheduler.run([(model, partial(render, model)) for model in names], dependencies):
+            yield model, ids_by_model[model], rendered
 
     def __generate_init_files(self, module: str):
         """Generate the __init__.py files for the exported module."""
@@ -163,7 +529,7 @@ class ExportCommand(DatabaseCommand):
         init_folder = [] if self.args.importable else ["models", "controllers"]
         generate_init_file(module, ".", init_folder)
 
-        python_models = [f.name for f in Path(self.args.path / module / "models").glob("*.py")]
+        python_models = [f.name for f in self.merge.files(module, "models") if f.suffix == ".py"]
         generate_init_file(module, "models", python_models)
 
     def __generate_manifest(self, module: str):
@@ -171,7 +537,7 @@ class ExportCommand(DatabaseCommand):
 
         manifest_file = Path(self.args.path / module / "__manifest__.py")
 
-        depends = [m for m in ConverterBase.depends if m not in ["base", module]] or ["base"]
+        depends = [m for m in sorted(self.depends[module]) if m not in ["base", module]] or ["base"]
 
         manifest: dict[str, Union[str, List[str]]] = {
             "name": f"{module} export",
@@ -181,22 +547,27 @@ class ExportCommand(DatabaseCommand):
         }
 
         for folder in ["data", "views", "security"]:
-            for file in Path(self.args.path / module / folder).glob("*"):
+            for file in self.merge.files(module, folder):
                 if type(manifest["data"]) == list:
                     manifest["data"].append(f"{folder}/{file.name}")
 
         with open(manifest_file, "w") as f:
-            f.write(black.format_str(str(manifest), mode=black.FileMode(line_length=120)))
+            f.write(self.formatter.format_value(manifest))
 
-    def __generate_mig_script(self, module: str, records: list[dict[str, Any]], config: dict[str, Any]):
+    def __generate_mig_script(
+        self, module: str, mapped_models: List[tuple[str, str]], mapped_fields: List[tuple[str, str, str]]
+    ):
         """https://github.com/odoo-ps/ps-tech-odev/blob/main/odev/templates/default/sh/scaffold_pre-10.jinja"""
 
         imports = {"odoo": ["SUPERUSER_ID", "api"], "odoo.upgrade": ["util"], "logging": [], "os": []}
 
-        mig_script: str = self.converter_py.export_mig_script(imports, records, config)
+        mig_script: str = self.converter_py.export_mig_script(imports, mapped_models, mapped_fields)
         mig_script_path = Path(self.args.path, module, "migrations", str(self._database.version) + ".1.0.0")
 
         if not mig_script:
+            if self.args.incremental:
+                Path(mig_script_path, "pre-10.py").unlink(missing_ok=True)
+
             return
 
         mig_script_path.mkdir(parents=True, exist_ok=True)
@@ -211,6 +582,8 @@ class ExportCommand(DatabaseCommand):
         """Load the config file and override config for importable module if needed
         :return: The config file
         """
+        import yaml
+
         if not (config_file := self.args.export_config):
             config_file = Path(os.path.dirname(__file__)).parent / "export.yaml"
 
@@ -245,41 +618,59 @@ class ExportCommand(DatabaseCommand):
         """Load the XML IDs from the database.
         :return: The XML IDs and XML IDs to export
         """
-        with progress.spinner("Loading all XML IDs"):
-            imd = self._database.models["ir.model.data"].search_read(
-                [],
-                fields=["res_id", "noupdate", "name", "module", "model"],
-                order="model, id desc",
-            )
-            xml_ids = defaultdict(list)
-            for i in imd:
-                xml_ids[i["model"]].append(i)
+        xml_ids = XmlIdRegistry(loader=self.__fetch_xml_ids)
+        self.xml_ids_cache_key = f"{','.join(sorted(models))}|{','.join(sorted(self.args.modules))}"
+
+        snapshot = self.cache.get("ir.model.data", self.xml_ids_cache_key)
+        self.xml_ids_cached = snapshot is not None
+
+        if snapshot is not None:
+            xml_ids.restore(snapshot)
+            logger.info(f"{len(xml_ids)} XML IDs records loaded from cache")
+        else:
+            with progress.spinner("Loading XML IDs"):
+                imd_domain = [("model", "in", list(models)), ("module", "in", self.args.modules)]
+
+                for page in search_read_paginated(
+                    self.models["ir.model.data"], imd_domain, XML_ID_FIELDS, XML_IDS_PAGE_SIZE
+                ):
+                    for xml_id in page:
+                        xml_ids.add(xml_id)
 
-        logger.info(f"{len(imd)} XML IDs records loaded")
+            logger.info(f"{len(xml_ids)} XML IDs records loaded")
 
         with progress.spinner("Loading XML IDs to export"):
             ids_to_export: Dict[str, Dict[str, List[int]]] = defaultdict(
                 lambda: {k: [] for k in self.export_config.keys()}
             )
 
-            for model, id_ in xml_ids.items():
+            for model in list(xml_ids.models()):
                 for xml_id in filter(
-                    lambda x: x["module"] in self.args.modules and x["model"] in self.export_config.keys(), id_
+                    lambda x: x["module"] in self.args.modules and x["model"] in self.export_config.keys(),
+                    xml_ids.records(model),
                 ):
                     ids_to_export[xml_id["module"]][model].append(xml_id["res_id"])
 
-            for model, config in self.export_config.items():
-                ids = [x["res_id"] for x in xml_ids[model]]
+            def load_records(item: Tuple[str, dict]) -> Tuple[str, Optional[List[int]], List[dict]]:
+                model, config = item
                 domain = ast.literal_eval(config.get("domain", "[]"))
 
-                if ids:
-                    domain.append(("id", "not in", ids))
                 try:
-                    ids_ = [x["id"] for x in self._database.models[model].search_read(domain, fields=["id"])]
+                    ids = [x["id"] for x in self.models[model].search_read(domain, fields=["id"])]
+                    imd = self.__fetch_xml_ids(model, [id_ for id_ in ids if not xml_ids.is_known(model, id_)])
+                except ConnectorError as conn_error:
+                    # Records whose XML ID could not be looked up are not exported as orphans, they may have one
+                    logger.error(f"Failed to load {model} records and their XML IDs: {conn_error}")
+                    return model, None, []
+
+                return model, ids, imd
+
+            for model, ids, imd in self.__map(load_records, self.export_config.items()):
+                if ids is None:
+                    continue
 
-                    ids_to_export["__export_module__"][model] += ids_
-                except ConnectorError:
-                    logger.error(f"Failed to load {model} records")
+                xml_ids.register(model, ids, imd)
+                ids_to_export["__export_module__"][model] += [id_ for id_ in ids if xml_ids.find(model, id_) is None]
 
         ids_to_export_count = len(list(chain(*chain(*(m.values() for m in ids_to_export.values())))))
         logger.info(f"{ids_to_export_count} records to export")
@@ -293,8 +684,8 @@ class ExportCommand(DatabaseCommand):
                         if model_name in models.keys() and inc.get("inverse_name", False):
                             ids_ = [
                                 r[inc["inverse_name"]]
-                                for r in self._database.models[model_name].search_read(
-                                    [["id", "in", models[model_name]]], fields=[inc["inverse_name"]]
+                                for r in chain(
+                                    *self.fetcher.read(model_name, models[model_name], [inc["inverse_name"]])
                                 )
                             ]
 
@@ -305,14 +696,46 @@ class ExportCommand(DatabaseCommand):
 
         return xml_ids, ids_to_export
 
-    def __get_records(self, module: str, model: str, ids: Optional[List[int]] = None, pk: str = "id") -> List[dict]:
-        """Get the records to export.
+    def __fetch_xml_ids(self, model: str, res_ids: List[int]) -> List[dict]:
+        """Fetch the XML IDs of the given records, used by the registry to resolve references on demand.
+        A failing page raises, a partial result would mark the records of the page as having no XML ID.
+        :param model: The model of the records
+        :param res_ids: The ids of the records
+        :return: The `ir.model.data` records of the given records
+        """
+        imd: List[dict] = []
+
+        for index in range(0, len(res_ids), XML_IDS_PAGE_SIZE):
+            imd += self.models["ir.model.data"].search_read(
+                [("model", "=", model), ("res_id", "in", res_ids[index : index + XML_IDS_PAGE_SIZE])],
+                fields=XML_ID_FIELDS,
+            )
+
+        return imd
+
+    def __search_read_chunks(
+        self, model: str, domain: List, fields: List[str], order: str = None
+    ) -> Generator[List[dict], None, None]:
+        """Read the records matching a domain by chunks, in the requested order.
+        The ordered ids are fetched first so that chunks are selected by id and not by offset.
+        :param model: The model to read
+        :param domain: The domain to filter the records
+        :param fields: The fields to read
+        :param order: The order of the records
+        :return: A generator of chunks of records
+        """
+        ids = [r["id"] for r in self.models[model].search_read(domain, fields=["id"], order=order)]
+        yield from self.fetcher.read(model, ids, fields)
+
+    def __get_records(
+        self, module: str, model: str, ids: Optional[List[int]] = None, pk: str = "id"
+    ) -> Generator[List[dict], None, None]:
+        """Get the records to export, by chunks, with their included records.
         :param module: The module to export
         :param model: The model to export
         :param ids: List of id to export
         :param pk: Name of the primary key table used to load records
-        :param same_module: If True, only export records for the current module
-        :return: A list of records to export
+        :return: A generator of chunks of records to export
         """
         config = self.export_config[model]
         domain = ast.literal_eval(config.get("domain", "[]"))
@@ -321,21 +744,26 @@ class ExportCommand(DatabaseCommand):
             domain.append([pk, "in", ids])
 
         try:
-            # TODO: Yield record one by one in case of error
-            data = self._database.models[model].search_read(
-                domain, fields=config.get("fields", []), order=config.get("order", [])
-            )
+            for data in self.__search_read_chunks(model, domain, config.get("fields", []), config.get("order")):
+                self.__resolve_includes(module, config, data)
+                yield data
         except ConnectorError as conn_error:
             logger.error(f"Failed to export {model} records: {conn_error}")
-            return []
 
+    def __resolve_includes(self, module: str, config: dict, data: List[dict]):
+        """Fetch the records included in a chunk of records and attach them to their parent record.
+        :param module: The module to export
+        :param config: The export configuration of the model of the records
+        :param data: The chunk of records
+        """
         for inc_model, inc_config in config.get("includes", {}).items():
             inc_ids = [r[inc_config["field"]] for r in data]
-            inc_data = self.__get_records(module, inc_model, inc_ids, inc_config["inverse_name"])
+            inc_records = self.__get_records(module, inc_model, inc_ids, inc_config["inverse_name"])
+            inc_data = list(chain(*self.profiler.iterate("fetch", inc_records, module, inc_model)))
 
             same_module_ids = includes_xml_ids = {}
             if inc_config["inverse_name"] != "id":
-                includes_xml_ids = get_xml_ids(self.xml_ids, inc_model, [r["id"] for r in inc_data])
+                includes_xml_ids = self.xml_ids.resolve(inc_model, [r["id"] for r in inc_data])
                 same_module_ids = {
                     x["res_id"]: x
                     for x in includes_xml_ids.values()
@@ -356,43 +784,140 @@ class ExportCommand(DatabaseCommand):
                 if str(record[inc_config["field"]]) in inc_data_dict.keys():
                     record[inc_model] = inc_data_dict[str(record[inc_config["field"]])]
 
-        return data
-
-    def export(self, module: str, model: str, ids: List[int] = None):
-        """Export records.
+    def __get_chunks(
+        self, module: str, model: str, ids: List[int] = None
+    ) -> Generator[Tuple[List[dict], FieldsGetMapping, dict], None, None]:
+        """Get the records to export by chunks, along with the fields definition and defaults of their model.
+        :param module: The module to export
+        :param model: The model to export
+        :param ids: List of id to export
+        :return: A generator of chunks of records, with the result of `fields_get` and `default_get`
+        """
+        fields_get = default_get = None
+
+        for records in self.profiler.iterate("fetch", self.__get_records(module, model, ids), module, model):
+            if fields_get is None:
+                fields_get = self.__fields_get(model)
+                default_get = self.__default_get(model, list(fields_get.keys()))
+
+            yield records, fields_get, default_get
+
+    def export(
+        self,
+        module: str,
+        model: str,
+        ids: List[int] = None,
+        chunks: Iterable[Tuple[List[dict], FieldsGetMapping, dict]] = None,
+    ):
+        """Export records, converting and merging them chunk by chunk as they are fetched.
         :param module: The module to export
         :param model: The model to export
         :param ids: List of id to export
+        :param chunks: The chunks of records to export if already being fetched, fetched from `ids` otherwise
         :return: None
         """
+        with self.profiler.model(module, model):
+            rendered = self.__render(module, model, chunks or self.__get_chunks(module, model, ids))
+            self.__commit(module, model, ids, rendered)
+
+    def __render(
+        self, module: str, model: str, chunks: Iterable[Tuple[List[dict], FieldsGetMapping, dict]]
+    ) -> Generator[RenderedChunk, None, None]:
+        """Convert chunks of records to code, lazily.
+        :param module: The module to export
+        :param model: The model to export
+        :param chunks: The chunks of records to export, with the result of `fields_get` and `default_get`
+        :return: A generator of the number of records of each chunk, the models and fields renamed by
+            its `ir.model` records and its converted records
+        """
         config = self.export_config[model]
-        records = self.__get_records(module, model, ids)
-        _records = copy.deepcopy(records)
 
-        if not records:
-            return
+        for records, fields_get, default_get in chunks:
+            renames = [
+                (record["id"], *self.converter_py.get_renamed_models([record], config))
+                for record in (records if model == "ir.model" else [])
+            ]
+            converted = self.profiler.iterate(
+                "convert",
+                (self.renderer or self.converter).convert(records, fields_get, default_get, model, module, config),
+                module,
+                model,
+            )
+
+            yield len(records), renames, converted  # type: ignore
 
-        fields_get = self._database.models[model].fields_get()
+    def __track(self, description: str, total: Optional[int]) -> Any:
+        """Add a progress bar, displayed along with those of the models merged in parallel by other modules.
+        :return: The task of the progress bar
+        """
+        with self.display_lock:
+            if self.tracker is None:
+                self.tracker = progress.Progress()
+                self.tracker.start()
+
+            return self.tracker.add_task(description, total=total)
+
+    def __untrack(self, task: Any) -> None:
+        """Remove a progress bar, the display being stopped along with the last one."""
+        with self.display_lock:
+            self.tracker.remove_task(task)
+
+            if not self.tracker.tasks:
+                self.tracker.stop()
+                self.tracker = None
+
+    def __commit(self, module: str, model: str, ids: Optional[List[int]], rendered: Iterable[RenderedChunk]):
+        """Merge the converted records of a model into their files and update the state of the export.
+        :param module: The module to export
+        :param model: The model to export
+        :param ids: List of id to export
+        :param rendered: The rendered chunks of records
+        """
+        config = self.export_config[model]
+        state = self.states.get(module)
+        mapped_models: List[tuple[str, str]] = []
+        mapped_fields: List[tuple[str, str, str]] = []
+        count = 0
+
+        task = self.__track(f"Exporting {len(ids or [])} {model} records", len(ids) if ids else None)
+
+        try:
+            for chunk_count, renames, converted in rendered:
+                for record_id, renamed_models, renamed_fields in renames:
+                    mapped_models += renamed_models
+                    mapped_fields += renamed_fields
+
+                    if state is not None:
+                        state.update(model, record_id, renames=[renamed_models, renamed_fields])
 
-        default_get = self._database.models[model].default_get(list(fields_get.keys()))
+                for record, code in converted:
+                    if code:
+                        with self.profiler.stage("merge", module, model):
+                            file, key = self.merge.merge(module, code, model, record, config)
 
-        tracker = progress.Progress()
-        task = tracker.add_task(f"Exporting {len(records)} {model} records", total=len(records))
-        tracker.start()
+                        if state is not None:
+                            state.update(model, record["id"], file=file, key=key)
 
-        for record, code in self.converter.convert(records, fields_get, default_get, model, module, config):
-            if code:
-                file_name, code = self.merge.merge(module, code, model, record, config)
+                    with self.display_lock:
+                        self.tracker.update(task, advance=1)
 
-                with open(file_name, "w") as f:
-                    f.write(code)
+                count += chunk_count
+        finally:
+            self.__untrack(task)
 
-            tracker.update(task, advance=1)
+        for entry in state.outdated(model) if state is not None else []:
+            if entry["file"]:
+                self.merge.remove(module, entry["file"], entry["key"])
 
-        tracker.stop()
+        if not count:
+            return
 
-        logger.info(f"Exported {len(records)} {model} records")
+        logger.info(f"Exported {count} {model} records")
 
         if model == "ir.model":
+            if state is not None:
+                # Include the renames of the unchanged records of the previous exports
+                mapped_models, mapped_fields = self.__state_renames(state)
+
             logger.info("Exported 'pre-10' migration script")
-            self.__generate_mig_script(module, _records, config)
+            self.__generate_mig_script(module, mapped_models, mapped_fields)
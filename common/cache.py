@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from odev.common.logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "odev" / "export"
+
+
+class MetadataCache:
+    """Persistent cache of database metadata (`fields_get`, `default_get`, `ir.model.data`) shared between runs.
+
+    Entries are stored as JSON files under a folder per database and Odoo version. Each entry is stamped with
+    the validation token of its kind at the time it was written, typically the last `write_date` of the records
+    it derives from, and is discarded when that token changed or when it is older than `max_age`.
+    The least recently written entries are evicted once the cache grows over `max_size`.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        version: str,
+        path: Path = DEFAULT_CACHE_PATH,
+        max_age: int = 24 * 60 * 60,
+        max_size: int = 256 * 1024 * 1024,
+        enabled: bool = True,
+        refresh: bool = False,
+    ) -> None:
+        """Initialize the cache.
+        :param database: The name of the database
+        :param version: The version of Odoo running the database
+        :param path: The root folder of the cache, shared by all databases
+        :param max_age: The maximum age of an entry, in seconds
+        :param max_size: The maximum size of the cache on disk, in bytes, for all databases
+        :param enabled: Whether entries are read from and written to disk at all
+        :param refresh: Whether existing entries are ignored, new entries are still written
+        """
+        self.root = Path(path)
+        self.path = self.root / re.sub(r"[^\w.-]", "_", f"{database}-{version}")
+        self.max_age = max_age
+        self.max_size = max_size
+        self.enabled = enabled
+        self.refresh = refresh
+        self.tokens: Dict[str, str] = {}
+
+    def validate(self, tokens: Dict[str, str]) -> None:
+        """Set the current validation token of each kind of entry, entries written with another token are stale."""
+        self.tokens = tokens
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        """Return a cached value, or `None` if it is missing, stale or the cache is disabled.
+        :param kind: The kind of the entry, matching a validation token
+        :param key: The key of the entry within its kind
+        """
+        if not self.enabled or self.refresh:
+            return None
+
+        file = self._file(kind, key)
+
+        try:
+            with open(file) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("token") != self.tokens.get(kind) or time.time() - entry.get("time", 0) > self.max_age:
+            logger.debug(f"Discarding stale {kind} cache entry {key}")
+            file.unlink(missing_ok=True)
+            return None
+
+        return entry["value"]
+
+    def set(self, kind: str, key: str, value: Any) -> None:
+        """Store a value in the cache.
+        :param kind: The kind of the entry, matching a validation token
+        :param key: The key of the entry within its kind
+        :param value: The value to store, must be JSON-serializable
+        """
+        if not self.enabled:
+            return
+
+        file = self._file(kind, key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Each write has its own temporary file, the same entry may be written by several threads at once
+        with tempfile.NamedTemporaryFile(
+            "w", dir=file.parent, prefix=f"{file.stem}.", suffix=".tmp", delete=False
+        ) as f:
+            json.dump({"token": self.tokens.get(kind), "time": time.time(), "key": key, "value": value}, f)
+
+        os.replace(f.name, file)
+
+    def evict(self) -> None:
+        """Remove the oldest entries of all databases until the cache fits in `max_size`."""
+        if not self.enabled or not self.root.exists():
+            return
+
+        files = sorted(
+            ((file.stat().st_mtime, file.stat().st_size, file) for file in self.root.rglob("*.json")),
+            key=lambda entry: entry[0],
+        )
+        size = sum(entry[1] for entry in files)
+
+        for _, file_size, file in files:
+            if size <= self.max_size:
+                break
+
+            file.unlink(missing_ok=True)
+            size -= file_size
+            logger.debug(f"Evicted cache entry {file}")
+
+    def _file(self, kind: str, key: str) -> Path:
+        return self.path / kind / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+class RecordCache:
+    """Records read during an export, shared by the models including the same records, such as the `ir.model`
+    records included in server actions, automations and crons and also exported on their own.
+
+    Records are cached by model and id along with the fields read so far, the fields read by later calls are
+    merged into them. Copies are returned, restricted to the requested fields, as exported records are updated
+    in place. The least recently used records are evicted once their estimated size grows over `max_size`.
+    """
+
+    def __init__(self, max_size: int = 256 * 1024 * 1024) -> None:
+        """Initialize the cache.
+        :param max_size: The maximum estimated size of the cached records, in bytes
+        """
+        self.max_size = max_size
+        self.size = 0
+        self.hits = self.misses = 0
+        # Record, whether all its fields were read and its estimated size, by model and id
+        self._entries: OrderedDict[Tuple[str, int], Tuple[dict, bool, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model: str, ids: List[int], fields: List[str]) -> Dict[int, dict]:
+        """Return the cached records having all the requested fields.
+        :param model: The model of the records
+        :param ids: The ids of the records
+        :param fields: The fields to read, all fields if empty
+        :return: Copies of the cached records, by id, ids missing or lacking fields are left out
+        """
+        records: Dict[int, dict] = {}
+
+        with self._lock:
+            for id_ in ids:
+                entry = self._entries.get((model, id_))
+
+                if entry is None or not entry[1] and (not fields or not entry[0].keys() >= set(fields)):
+                    self.misses += 1
+                    continue
+
+                self._entries.move_to_end((model, id_))
+                records[id_] = self._project(entry[0], fields)
+                self.hits += 1
+
+        return records
+
+    def add(self, model: str, records: List[dict], fields: List[str]) -> List[dict]:
+        """Cache records read from the database, merging their fields with those already cached.
+        :param model: The model of the records
+        :param records: The records read
+        :param fields: The fields read, all fields if empty
+        :return: Copies of the records
+        """
+        with self._lock:
+            for record in records:
+                key = (model, record["id"])
+                record_fields, complete, size = self._entries.pop(key, ({}, False, 0))
+
+                if fields:
+                    record_fields = {**record_fields, **record}
+                else:
+                    record_fields, complete = dict(record), True
+
+                entry_size = sum(sys.getsizeof(value) for value in record_fields.values())
+                self._entries[key] = (record_fields, complete, entry_size)
+                self.size += entry_size - size
+
+            while self.size > self.max_size and self._entries:
+                _, (_, _, size) = self._entries.popitem(last=False)
+                self.size -= size
+
+        return [self._project(record, fields) for record in records]
+
+    def report(self) -> None:
+        logger.debug(f"Record cache: {self.hits} hits, {self.misses} misses, {len(self)} records kept")
+
+    def _project(self, record: dict, fields: List[str]) -> dict:
+        """Copy a record, restricted to the given fields if any, relational values being copied as well."""
+        names = ["id", *fields] if fields else record.keys()
+        return {name: list(record[name]) if isinstance(record[name], list) else record[name] for name in names}
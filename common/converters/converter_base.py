@@ -1,39 +1,67 @@
+import threading
 from abc import ABC, abstractmethod
+from collections import defaultdict
 from typing import (
     Any,
     Dict,
     Generator,
+    Iterable,
     List,
+    Mapping,
+    Set,
+    TypeVar,
     Union,
+    cast,
 )
 
 from odev.common.connectors.rpc import FieldsGetMapping
 from odev.common.logging import logging
 from odev.common.version import OdooVersion
 
-from odev.plugins.odev_plugin_export.common.odoo import RecordMetaData, get_xml_ids, rename_field_base
+from odev.plugins.odev_plugin_export.common.formatter import Formatter
+from odev.plugins.odev_plugin_export.common.fragments import Fragment
+from odev.plugins.odev_plugin_export.common.odoo import RecordMetaData, RenameMap, XmlIdRegistry
 
 
 logger = logging.getLogger(__name__)
 
+# A record or the metadata of a record, renamed into a copy of the same type
+RecordType = TypeVar("RecordType", bound=Mapping[str, Any])
+
 
 class ConverterBase(ABC):
     version: OdooVersion = None
     migrate_code: bool = True
     prettify: bool = False
-    xml_ids: List[Dict] = None
+    xml_ids: XmlIdRegistry = None
+    formatter: Formatter = None
     fields_to_rename: List[str] = []
+    renames: RenameMap = None
 
-    depends: List[str] = []
+    depends: Dict[str, Set[str]] = None
+    _depends_lock = threading.Lock()
 
     def __init__(
-        self, version: OdooVersion = None, prettify: bool = False, xml_ids: List[Dict] = None, migrate_code: bool = True
+        self,
+        version: OdooVersion = None,
+        prettify: bool = False,
+        xml_ids: XmlIdRegistry = None,
+        migrate_code: bool = True,
+        formatter: Formatter = None,
+        depends: Dict[str, Set[str]] = None,
+        renames: RenameMap = None,
     ) -> None:
-        """Initialize the Converter configuration."""
+        """Initialize the Converter configuration.
+        :param depends: The modules the exported records depend on, by exported module, filled by the converter
+        :param renames: The names cleaned during the export, shared by the converters
+        """
         self.version: OdooVersion = version
         self.prettify = prettify
         self.xml_ids = xml_ids
         self.migrate_code = migrate_code
+        self.formatter = formatter or Formatter()
+        self.depends = depends if depends is not None else defaultdict(set)
+        self.renames = renames if renames is not None else RenameMap()
 
     @abstractmethod
     def convert(
@@ -44,33 +72,40 @@ class ConverterBase(ABC):
         model: str,
         module: str,
         config: Dict,
-    ) -> Generator[tuple[Dict[Any, Any], Union[str, tuple[str, Any, str, str]]], None, None]:
+    ) -> Generator[tuple[Dict[Any, Any], Fragment], None, None]:
         raise NotImplementedError("convert method must be implemented in subclass")
 
-    def _rename_fields(
-        self,
-        records: Union[Dict[Union[int, str], Any], List[Dict[Union[int, str], Any]]],
-        config: Dict[str, Any] = None,
-    ):
-        if self.migrate_code:
-            if isinstance(records, Dict):
-                records = [records]
-
-            for record in records:
-                for field in self.fields_to_rename:
-                    if field in record.keys() and record[field]:
-                        record[field] = rename_field_base(record[field])
-
-                    if config:
-                        for inc_model in config.get("includes", []):
-                            if inc_model in record:
-                                self._rename_fields(record[inc_model])
+    def _rename(self, record: RecordType, config: Dict[str, Any] = None) -> RecordType:
+        """Clean the names of the `fields_to_rename` of a record and its included records through the rename map.
+        :param record: The record, left untouched
+        :param config: The export configuration of the model of the record, to rename its included records
+        :return: A shallow copy of the record with the cleaned names, the record itself without code migration
+        """
+        if not self.migrate_code:
+            return record
+
+        renamed = dict(record)
+
+        for field in self.fields_to_rename:
+            if renamed.get(field):
+                renamed[field] = self.renames.get(renamed[field])
+
+        for inc_model in (config or {}).get("includes", []):
+            if inc_model in renamed:
+                renamed[inc_model] = [self._rename(inc_record) for inc_record in renamed[inc_model]]
+
+        return cast(RecordType, renamed)
 
     def get_xml_ids(
-        self, xml_ids, model: str = "", ids: List = None, rename_field: bool = False, module: str = ""
+        self, xml_ids: XmlIdRegistry, model: str = "", ids: List = None, module: str = ""
     ) -> Dict[Union[int, str], RecordMetaData]:
-        xml_ids = get_xml_ids(xml_ids, model, ids, rename_field, module)
+        xml_ids = xml_ids.resolve(model, ids, module)
 
-        ConverterBase.depends = list(set(ConverterBase.depends + [x["module"] for x in xml_ids.values()]))
+        self.add_depends(module, (x["module"] for x in xml_ids.values()))
 
         return xml_ids
+
+    def add_depends(self, module: str, modules: Iterable[str]) -> None:
+        """Register modules the exported records of a module depend on, records being converted in several threads."""
+        with ConverterBase._depends_lock:
+            self.depends[module].update(modules)
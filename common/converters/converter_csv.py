@@ -1,9 +1,9 @@
-import csv
-from io import StringIO
-from typing import Generator, Tuple
+from typing import Any, Dict, Generator, Tuple
 
 from odev.common.connectors.rpc import FieldsGetMapping
 
+from odev.plugins.odev_plugin_export.common.fragments import CsvFragment
+
 from .converter_base import ConverterBase
 
 
@@ -18,30 +18,43 @@ class ConverterCsv(ConverterBase):
         model: str,
         module: str,
         config: dict,
-    ) -> Generator[Tuple[dict, str], None, None]:
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(config["fields"])
-
-        self._rename_fields(records, config)
+    ) -> Generator[Tuple[dict, CsvFragment], None, None]:
+        records = [self._rename(record, config) for record in records]
+        record_metadatas = self.get_xml_ids(self.xml_ids, model, [r["id"] for r in records], module=module)
+        references = self._resolve_references(records, fields_get, module, config)
+        header = tuple(config["fields"])
 
         for record in records:
-            items = []
-            for field in config["fields"]:
+            record_metadata = record_metadatas[record["id"]]
+            # Records without XML ID get the generated name, as in XML exports
+            record["__xml_id"] = record_metadata["xml_id"] or record_metadata["name"]
 
-                if relation := fields_get[field].get("relation"):
-                    record_metadata = self.get_xml_ids(self.xml_ids, relation, [record[field]], module=module)
-                    self._rename_fields(record_metadata[record[field]])
-                    record_metadata = record_metadata[record[field]]
-
-                    items.append(record_metadata["xml_id"])
+            items = []
+            for field in header:
+                if field in references:
+                    items.append(references[field][record[field]])
                 elif field == "id":
-                    record_metadata = self.get_xml_ids(self.xml_ids, model, [record["id"]], module=module)
-                    self._rename_fields(record_metadata[record[field]])
-                    items.append(record_metadata[record["id"]]["xml_id"])
+                    items.append(record["__xml_id"])
                 else:
                     items.append(str(record.get(field, "")))
 
-            writer.writerow(items)
-
-        yield ({}, output.getvalue())
+            yield (record, CsvFragment(header, [tuple(items)]))
+
+    def _resolve_references(
+        self, records: list[dict], fields_get: FieldsGetMapping, module: str, config: dict
+    ) -> Dict[str, Dict[Any, str]]:
+        """Resolve the XML IDs of the records referenced by the relational columns, with one lookup per column
+        for all the records and each referenced record renamed once.
+        :return: The XML IDs of the referenced records, by column and by value
+        """
+        references: Dict[str, Dict[Any, str]] = {}
+
+        for field in config["fields"]:
+            if relation := fields_get[field].get("relation"):
+                values = list(dict.fromkeys(record[field] for record in records))
+                relation_metadatas = self.get_xml_ids(self.xml_ids, relation, values, module=module)
+                references[field] = {
+                    value: self._rename(metadata)["xml_id"] for value, metadata in relation_metadatas.items()
+                }
+
+        return references
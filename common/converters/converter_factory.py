@@ -1,34 +1,52 @@
-from typing import Any, Generator, Type, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Generator,
+    Type,
+    Union,
+)
 
 from odev.common.logging import logging
 
+from odev.plugins.odev_plugin_export.common.fragments import Fragment
+
 from .converter_base import ConverterBase
-from .converter_csv import ConverterCsv
-from .converter_python import ConverterPython
-from .converter_xml import ConverterXml
+
+
+if TYPE_CHECKING:
+    from .converter_csv import ConverterCsv
+    from .converter_python import ConverterPython
+    from .converter_xml import ConverterXml
 
 
 logger = logging.getLogger(__name__)
 
-ConverterType = Type[Union[ConverterPython, ConverterXml, ConverterCsv]]
+ConverterType = Type[Union["ConverterPython", "ConverterXml", "ConverterCsv"]]
 
 
 class ConverterFactory(ConverterBase):
     def convert(
         self, data, fields_get, default_get, model, module: str, config
-    ) -> Generator[tuple[dict[Any, Any], Union[str, tuple[str, Any, str, str]]], None, None]:
+    ) -> Generator[tuple[dict[Any, Any], Fragment], None, None]:
         converter_cls: ConverterType = None
 
+        # Converters are imported on demand, along with their dependencies (astunparse, lxml)
         match config["format"]:
             case "py":
+                from .converter_python import ConverterPython
+
                 converter_cls = ConverterPython
             case "xml":
+                from .converter_xml import ConverterXml
+
                 converter_cls = ConverterXml
             case "csv":
+                from .converter_csv import ConverterCsv
+
                 converter_cls = ConverterCsv
             case _:
                 raise ValueError("Unsupported data type")
 
-        return converter_cls(self.version, self.prettify, self.xml_ids, self.migrate_code).convert(
-            data, fields_get, default_get, model, module, config
-        )
+        return converter_cls(
+            self.version, self.prettify, self.xml_ids, self.migrate_code, self.formatter, self.depends, self.renames
+        ).convert(data, fields_get, default_get, model, module, config)
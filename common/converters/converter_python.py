@@ -1,5 +1,4 @@
 import ast
-import copy
 import re
 from typing import (
     Any,
@@ -10,19 +9,19 @@ from typing import (
 )
 
 import astunparse
-import black
-from black import InvalidInput
 
 from odev.common.connectors.rpc import FieldsGetMapping
 from odev.common.string import indent
 
 from odev.plugins.odev_plugin_export.common.ast_newline import CustomUnparser, NewLine, unparse
+from odev.plugins.odev_plugin_export.common.fragments import PythonFragment
 
 from .converter_base import ConverterBase
 
 
 class ConverterPython(ConverterBase):
     fields_to_rename = ["model", "name", "relation", "related", "depends", "compute"]
+    _class_imports: str = None
 
     def convert(
         self,
@@ -33,7 +32,7 @@ class ConverterPython(ConverterBase):
         module: str,
         config: dict,
         imports: dict[str, List] = None,
-    ) -> Generator[Tuple[dict[Any, Any], tuple[str, Any, str, str]], None, None]:
+    ) -> Generator[Tuple[dict[Any, Any], PythonFragment], None, None]:
         """Serialize the current model to readable python code.
         :return: The python code representation of the current model
         """
@@ -45,53 +44,70 @@ class ConverterPython(ConverterBase):
 
     def export_class(
         self, records: List[dict[str, Any]], config: dict[str, Any], imports: dict[str, List] = None
-    ) -> Generator[Tuple[dict[Any, Any], tuple[str, Any, str, str]], None, None]:
+    ) -> Generator[Tuple[dict[Any, Any], PythonFragment], None, None]:
 
-        self._rename_fields(records, config)
+        records = [self._rename(record, config) for record in records]
 
+        # The code is left unformatted, the whole file is formatted once merged
         for record in records:
-            class_imports = self._prettify(self.generate_imports({"odoo": ["models", "fields", "api"]}))
-            class_def = self.generate_class_definition(record)
-            class_def = self._prettify(class_def)
-            fields = self._prettify(self.generate_field_definitions(record), indent_level=4)
-            computes = self._prettify(self.generate_compute_definitions(record), indent_level=4)
+            class_def = self.generate_class_definition(record).strip("\n")
+            fields = indent(self.generate_field_definitions(record).strip("\n"), 4)
+            computes = indent(self.generate_compute_definitions(record).strip("\n"), 4)
+
+            yield (record, PythonFragment(record["model"], self.class_imports, class_def, fields, computes))
+
+    @property
+    def class_imports(self) -> str:
+        """The imports of the model classes, the same for all classes and generated once."""
+        if ConverterPython._class_imports is None:
+            ConverterPython._class_imports = self.generate_imports({"odoo": ["models", "fields", "api"]}).strip("\n")
+
+        return ConverterPython._class_imports
+
+    def get_renamed_models(
+        self, models: List[dict[str, Any]], config: dict[str, Any] = None
+    ) -> Tuple[List[tuple[str, str]], List[tuple[str, str, str]]]:
+        """List the models and fields of `ir.model` records that are renamed when migrating them to code,
+        read from the rename map without copying nor updating the records.
+        :return: The renamed models as `(old_name, new_name)` and fields as `(model, old_name, new_name)`
+        """
+        mapped_models: List[tuple[str, str]] = []
+        mapped_fields: List[tuple[str, str, str]] = []
 
-            yield (record, (class_imports, class_def, fields, computes))
+        if not self.migrate_code:
+            return mapped_models, mapped_fields
 
-    def export_mig_script(
-        self, imports: dict[str, List[str]] = None, models: List[dict[str, Any]] = None, config: dict[str, Any] = None
-    ) -> str:
-        code_import = self._prettify(self.generate_imports(imports))
+        includes = (config or {}).get("includes", {})
 
-        _models = copy.deepcopy(models)
-        self._rename_fields(_models, config)
+        for model in models:
+            if model["model"] and (new_model := self.renames.get(model["model"])) != model["model"]:
+                mapped_models.append((model["model"], new_model))
 
-        mapped_models: List[tuple[str, str]] = []
-        mapped_fields: List[tuple[str, str, str]] = []
+            for field in model.get("ir.model.fields", []) if "ir.model.fields" in includes else []:
+                if field["name"] and (new_name := self.renames.get(field["name"])) != field["name"]:
+                    mapped_fields.append((model["model"], field["name"], new_name))
 
-        for old_model, new_model in zip(models, _models):
-            if old_model["model"] != new_model["model"]:
-                mapped_models.append((old_model["model"], new_model["model"]))
+        return mapped_models, mapped_fields
 
-            for index, field in enumerate(old_model.get("ir.model.fields", [])):
-                new_field = new_model.get("ir.model.fields", [])[index]
-                if field["name"] != new_field.get("name"):
-                    mapped_fields.append((old_model["model"], field["name"], new_field.get("name")))
+    def export_mig_script(
+        self,
+        imports: dict[str, List[str]] = None,
+        mapped_models: List[tuple[str, str]] = None,
+        mapped_fields: List[tuple[str, str, str]] = None,
+    ) -> str:
+        if not mapped_models and not mapped_fields:
+            return ""
 
-        _method = self._prettify(self.generate_migration_script(mapped_models, mapped_fields), indent_level=0)
+        code_import = self.generate_imports(imports)
+        _method = self.generate_migration_script(mapped_models or [], mapped_fields or [])
 
-        return f"{code_import}\n\n{_method}" if mapped_models or mapped_fields else ""
+        return self._prettify(f"{code_import}\n\n{_method}")
 
     def export_init(self, imports: dict[Any, Any]) -> str:
         return self._prettify(self.generate_imports(imports))
 
     def _prettify(self, code: str, indent_level: int = 0) -> str:
-        try:
-            formated_text = black.format_str(code, mode=black.FileMode(line_length=120)).rstrip()
-        except InvalidInput:
-            formated_text = code.rstrip()
-
-        return indent(formated_text, indent_level)
+        return indent(self.formatter.format(code).rstrip(), indent_level)
 
     def generate_imports(self, imports: dict[str, List[str]]):
         _imports: List[Union[ast.Import, ast.ImportFrom]] = []
@@ -1,11 +1,12 @@
+from collections import defaultdict
 from io import StringIO
 from typing import (
     Any,
+    Dict,
     Generator,
     List,
     Literal,
     Mapping,
-    MutableMapping,
     Tuple,
     Union,
     cast,
@@ -13,17 +14,14 @@ from typing import (
 
 from lxml import etree
 
-from odev.common.connectors.rpc import FieldsGetMapping, RecordData
+from odev.common.connectors.rpc import FieldsGetMapping
 
+from odev.plugins.odev_plugin_export.common.fragments import XmlFragment
 from odev.plugins.odev_plugin_export.common.odoo import DEFAULT_MODULE_LIST, RecordMetaData
 
 from .converter_base import ConverterBase
 
 
-RPC_DATA_CACHE: MutableMapping[str, MutableMapping[int, RecordData]] = {}
-RPC_FIELDS_CACHE: MutableMapping[str, FieldsGetMapping] = {}
-
-
 class ConverterXml(ConverterBase):
     fields_to_rename = [
         "module",
@@ -46,43 +44,87 @@ class ConverterXml(ConverterBase):
     def __convert_xml_many2one(
         self,
         node: etree._Element,
-        fields_get: Mapping[str, Mapping[str, Union[str, bool]]],
         value: Union[Literal[False], int],
-        module: str,
+        references: Mapping[int, RecordMetaData],
     ) -> None:
         """Serialize a many2one field to XML.
         :param node: The XML node to serialize the field to
-        :param field: The name of the field to serialize
         :param value: The value of the field to serialize
+        :param references: The metadata of the records of the comodel, by id
         """
         if value is False:
             node.set("eval", str(value))
         else:
-            field = cast(str, node.get("name"))
-            record_metadata = self.get_xml_ids(self.xml_ids, str(fields_get[field]["relation"]), [value], module=module)
-            self._rename_fields(record_metadata[value])
-            node.set("ref", record_metadata[value]["xml_id"])
+            node.set("ref", references[value]["xml_id"])
 
     def __convert_xml_x2many(
-        self, node: etree._Element, fields_get: FieldsGetMapping, value: List[int], module: str
+        self, node: etree._Element, value: List[int], references: Mapping[int, RecordMetaData]
     ) -> None:
         """Serialize a x2many field to XML.
         :param node: The XML node to serialize the field to
-        :param field: The name of the field to serialize
         :param value: The value of the field to serialize
+        :param references: The metadata of the records of the comodel, by id
         """
-        field = cast(str, node.get("name"))
-        linked_record_metadata = self.get_xml_ids(self.xml_ids, fields_get[field]["relation"], value, module=module)
-        self._rename_fields(linked_record_metadata)
 
         def _link_command(metadata: RecordMetaData):
             linked_record_ref = f"ref('{metadata['xml_id']}')" if metadata["xml_id"] else metadata["res_id"]
             return f"Command.link({linked_record_ref})" if self.version.major >= 14 else f"(4, {linked_record_ref})"
 
-        commands = ", ".join(_link_command(metadata) for metadata in linked_record_metadata.values())
+        commands = ", ".join(_link_command(references[id_]) for id_ in dict.fromkeys(value))
 
         node.set("eval", f"[{commands}]")
 
+    def __prefetch_relations(
+        self, records_items: List[List[Tuple[str, Any]]], fields_get: FieldsGetMapping, module: str
+    ) -> Dict[str, Dict[int, RecordMetaData]]:
+        """Resolve the records referenced by the relational fields of a batch of records, with one lookup
+        per comodel, each referenced record being renamed once.
+        :param records_items: The fields and values exported for each record of the batch
+        :return: The metadata of the referenced records, by comodel and by id
+        """
+        ids_by_relation: Dict[str, Dict[int, None]] = defaultdict(dict)
+
+        for items in records_items:
+            for field, value in items:
+                if fields_get[field]["type"] in ("many2one", "one2many", "many2many") and value:
+                    ids = ids_by_relation[str(fields_get[field]["relation"])]
+                    ids.update(dict.fromkeys(value if isinstance(value, list) else [value]))
+
+        references: Dict[str, Dict[int, RecordMetaData]] = {}
+
+        for relation, ids in ids_by_relation.items():
+            metadatas = self.get_xml_ids(self.xml_ids, relation, list(ids), module=module)
+            references[relation] = {cast(int, id_): self._rename(metadata) for id_, metadata in metadatas.items()}
+
+        return references
+
+    def __get_record_items(
+        self, record: dict, fields_get: FieldsGetMapping, default_get: FieldsGetMapping, fields_order: List[str]
+    ) -> List[Tuple[str, Any]]:
+        """List the fields of a record to serialize with their values, in the order of the configuration,
+        fields with default values being skipped.
+        """
+        sorted_items = sorted(
+            record.items(), key=lambda x: fields_order.index(x[0]) if x[0] in fields_order else float("inf")
+        )
+        items: List[Tuple[str, Any]] = []
+
+        for field, value in sorted_items:
+            if field in ("id", "__xml_id") or field not in fields_get:
+                continue
+
+            if field == "copied" and "copied" not in default_get:
+                default_get[field] = (fields_get[field]["type"] != "one2many") and not (
+                    fields_get[field].get("related") or fields_get[field].get("computed")
+                )
+
+            if value == default_get.get(field, False) or fields_get[field]["type"] != "boolean" and not value:
+                continue
+
+            items.append((field, value))
+
+        return items
+
     def __convert_xml_any(self, node: etree._Element, fields_get: FieldsGetMapping, value: Any) -> None:
         """Serialize a field to XML.
         :param node: The XML node to serialize the field to
@@ -114,32 +156,29 @@ class ConverterXml(ConverterBase):
         model: str,
         module: str,
         config: dict,
-    ) -> Generator[Tuple[dict, str], None, None]:
+    ) -> Generator[Tuple[dict, XmlFragment], None, None]:
         """Serialize records with the given ids to XML.
         :param ids: The ids of the records to serialize
         :param fields: The fields to serialize, all fields by default
-        :return: The XML representation of the records with the given ids
+        :return: The `<record>` elements of the records with the given ids, serialized once merged
         """
         self._name = model
 
         record_metadatas = self.get_xml_ids(self.xml_ids, model, [r["id"] for r in records], module=module)
 
-        root = etree.Element("odoo")
+        records = [self._rename(record, config) for record in records]
 
-        self._rename_fields(records, config)
+        if model in ["ir.model", "ir.model.fields"]:
+            records = [record for record in records if record.get("state") != "base"]
 
-        for record in records:
+        # Relational values are resolved for the whole batch before any record is serialized
+        records_items = [
+            self.__get_record_items(record, fields_get, default_get, config["fields"]) for record in records
+        ]
+        references = self.__prefetch_relations(records_items, fields_get, module)
 
-            if model in ["ir.model", "ir.model.fields"] and record.get("state") == "base":
-                continue
-
-            record_metadata = record_metadatas[record["id"]]
-            self._rename_fields(record_metadata)
-
-            root = etree.Element("odoo")
-            if record_metadata["noupdate"]:
-                _root = root
-                root = etree.SubElement(root, "data", {"noupdate": str(int(record_metadata["noupdate"]))})
+        for record, items in zip(records, records_items):
+            record_metadata = self._rename(record_metadatas[record["id"]])
 
             module_name = (
                 f"{record_metadata['module']}."
@@ -148,54 +187,22 @@ class ConverterXml(ConverterBase):
             )
             record["__xml_id"] = f"{module_name}{record_metadata['name']}"
 
-            record_node = etree.SubElement(
-                root,
-                "record",
-                {"id": record["__xml_id"], "model": model},
-            )
-
-            fields_order = config["fields"]
-            sorted_items = sorted(
-                record.items(), key=lambda x: fields_order.index(x[0]) if x[0] in fields_order else float("inf")
-            )
-
-            for field, value in sorted_items:
-                if field in ("id", "__xml_id") or field not in fields_get:
-                    continue
-
-                if field == "copied" and "copied" not in default_get:
-                    default_get[field] = (fields_get[field]["type"] != "one2many") and not (
-                        fields_get[field].get("related") or fields_get[field].get("computed")
-                    )
-
-                if value == default_get.get(field, False) or fields_get[field]["type"] != "boolean" and not value:
-                    continue
+            record_node = etree.Element("record", {"id": record["__xml_id"], "model": model})
 
+            for field, value in items:
                 field_node = etree.SubElement(record_node, "field", {"name": field})
 
                 match fields_get[field]["type"]:
                     case "many2one":
                         value = cast(Union[int, Literal[False]], value)
-                        self.__convert_xml_many2one(field_node, fields_get, value, module)
+                        self.__convert_xml_many2one(field_node, value, references[str(fields_get[field]["relation"])])
                     case "one2many" | "many2many":
                         value = cast(List[int], value)
-                        self.__convert_xml_x2many(field_node, fields_get, value, module)
+                        self.__convert_xml_x2many(field_node, value, references[str(fields_get[field]["relation"])])
                     case "boolean":
                         value = cast(bool, value)
                         field_node.text = str(value)
                     case _:
                         self.__convert_xml_any(field_node, fields_get, value)
 
-            if record_metadata["noupdate"]:
-                root = _root
-
-            etree.indent(root, space=" " * 4)
-
-            xml = etree.tostring(
-                root,
-                pretty_print=True,
-                xml_declaration=True,
-                encoding="utf-8",
-            ).decode("utf-8")
-
-            yield (record, xml)
+            yield (record, XmlFragment(record_node, bool(record_metadata["noupdate"])))
@@ -0,0 +1,134 @@
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, Generator, List
+
+from odev.common.connectors.rpc import ConnectorError
+from odev.common.logging import logging
+
+from odev.plugins.odev_plugin_export.common.cache import RecordCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecordFetcher:
+    """Read records by batches whose size adapts to the latency and payload size measured on each RPC call,
+    separately for each model.
+
+    A batch failing with a `ConnectorError` is bisected until the offending records are isolated,
+    the healthy records of the batch are still returned and the failing ids are kept in `failures`.
+
+    With a record cache, records already read with the requested fields are not read again, only the missing
+    records of each batch are.
+    """
+
+    def __init__(
+        self,
+        models: Any,
+        batch_size: int = 500,
+        min_batch_size: int = 10,
+        max_batch_size: int = 5000,
+        target_latency: float = 2.0,
+        target_payload: int = 4 * 1024 * 1024,
+        cache: RecordCache = None,
+    ) -> None:
+        """Initialize the fetcher.
+        :param models: The RPC models proxy of the database to read from
+        :param batch_size: The initial number of records read per call, for each model
+        :param min_batch_size: The lower bound of the batch size
+        :param max_batch_size: The upper bound of the batch size
+        :param target_latency: The duration of a call, in seconds, the batch size is adjusted to
+        :param target_payload: The size of a response, in bytes, the batch size is adjusted to
+        :param cache: The cache of the records read during the export, records are always read if `None`
+        """
+        self.models = models
+        self.batch_size = batch_size
+        self.min_batch_size = min(min_batch_size, batch_size)
+        self.max_batch_size = max(max_batch_size, batch_size)
+        self.target_latency = target_latency
+        self.target_payload = target_payload
+        self.cache = cache
+        self.batch_sizes: Dict[str, int] = {}
+        self.failures: Dict[str, Dict[int, str]] = defaultdict(dict)
+
+    def get_batch_size(self, model: str) -> int:
+        """Return the number of records of a model read per call, as adapted to the previous calls."""
+        return self.batch_sizes.get(model, self.batch_size)
+
+    def read(self, model: str, ids: List[int], fields: List[str]) -> Generator[List[dict], None, None]:
+        """Read records by batches, in the order of the given ids.
+        :param model: The model to read
+        :param ids: The ids of the records to read
+        :param fields: The fields to read
+        :return: A generator of batches of records, failing records are left out
+        """
+        index = 0
+
+        while index < len(ids):
+            batch_ids = ids[index : index + self.get_batch_size(model)]
+            index += len(batch_ids)
+
+            if self.cache is None:
+                yield from self._read_batch(model, batch_ids, fields)
+                continue
+
+            records = self.cache.get(model, batch_ids, fields)
+            missing_ids = [id_ for id_ in batch_ids if id_ not in records]
+
+            for batch in self._read_batch(model, missing_ids, fields) if missing_ids else []:
+                records.update((record["id"], record) for record in self.cache.add(model, batch, fields))
+
+            yield [records[id_] for id_ in batch_ids if id_ in records]
+
+    def _read_batch(
+        self, model: str, ids: List[int], fields: List[str], split: bool = False
+    ) -> Generator[List[dict], None, None]:
+        """Read a batch of records, bisecting it on failure.
+        :param split: Whether the batch results from the bisection of a failing batch, the batch size is then
+            not adapted to the call, its latency telling nothing about that of a whole batch
+        """
+        try:
+            start = time.perf_counter()
+            records = self.models[model].search_read([("id", "in", ids)], fields=fields)
+            latency = time.perf_counter() - start
+        except ConnectorError as error:
+            if len(ids) == 1:
+                logger.warning(f"Failed to read {model} record {ids[0]}: {error}")
+                self.failures[model][ids[0]] = str(error)
+                return
+
+            logger.debug(f"Failed to read {len(ids)} {model} records, splitting the batch")
+            middle = len(ids) // 2
+            yield from self._read_batch(model, ids[:middle], fields, split=True)
+            yield from self._read_batch(model, ids[middle:], fields, split=True)
+            return
+
+        if not split:
+            self._adapt(model, len(ids), latency, len(json.dumps(records, default=str)))
+
+        records_by_id = {record["id"]: record for record in records}
+        yield [records_by_id[id_] for id_ in ids if id_ in records_by_id]
+
+    def _adapt(self, model: str, size: int, latency: float, payload: int) -> None:
+        """Resize the next batches of a model so that they match the target latency and payload, growing
+        at most twofold at once to avoid overshooting on a few fast calls.
+        """
+        current = self.get_batch_size(model)
+        by_latency = size * self.target_latency / max(latency, 1e-3)
+        by_payload = size * self.target_payload / max(payload, 1)
+        batch_size = int(min(by_latency, by_payload, current * 2))
+        batch_size = max(self.min_batch_size, min(self.max_batch_size, batch_size))
+
+        if batch_size != current:
+            logger.debug(f"Batch size of {model} adjusted from {current} to {batch_size} records")
+            self.batch_sizes[model] = batch_size
+
+    def report(self) -> None:
+        """Log the records that could not be read."""
+        if self.cache is not None:
+            self.cache.report()
+
+        for model, failures in self.failures.items():
+            ids = ", ".join(str(id_) for id_ in failures)
+            logger.error(f"{len(failures)} {model} records could not be exported: {ids}")
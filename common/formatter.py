@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from pprint import pformat
+from typing import Any, Callable, List
+
+from odev.common.logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+FORMATTERS = ["none", "fast", "black"]
+
+
+class FormatCache:
+    """Cache of formatted code, keyed by a hash of the source code and of the formatter settings.
+
+    Generated code repeats a lot across records and runs (field definitions, compute stubs, import blocks),
+    entries are kept in memory with a least recently used eviction and can be persisted to a file.
+    """
+
+    def __init__(self, max_entries: int = 4096, path: Path = None) -> None:
+        """Initialize the cache, loading the entries persisted by a previous run if any.
+        :param max_entries: The maximum number of entries kept
+        :param path: The file the entries are persisted to, not persisted if `None`
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path is not None and self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self._entries.update(json.load(f))
+            except (OSError, ValueError) as error:
+                logger.debug(f"Ignoring unreadable format cache {self.path}: {error}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, settings: str, code: str, func: Callable[[str], str]) -> str:
+        """Return the formatted code from the cache, formatting it on a miss.
+        :param settings: The name and settings of the formatter
+        :param code: The code to format
+        :param func: The function formatting the code
+        """
+        key = hashlib.sha1(f"{settings}\0{code}".encode()).hexdigest()
+
+        with self._lock:
+            if (formatted := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return formatted
+
+        formatted = func(code)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = formatted
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return formatted
+
+    def save(self) -> None:
+        """Persist the entries to the cache file, if any."""
+        logger.debug(f"Format cache: {self.hits} hits, {self.misses} misses")
+
+        if self.path is None or not self.misses:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock, tempfile.NamedTemporaryFile(
+            "w", dir=self.path.parent, prefix=f"{self.path.stem}.", suffix=".tmp", delete=False
+        ) as f:
+            json.dump(self._entries, f)
+
+        os.replace(f.name, self.path)
+
+
+class Formatter:
+    """Format generated Python code, once per output file rather than once per generated snippet.
+
+    - `black` formats the code with black
+    - `fast` only normalizes the blank lines and trailing whitespace, much faster than black
+    - `none` leaves the code as generated
+    """
+
+    def __init__(self, mode: str = "black", line_length: int = 120, cache: FormatCache = None) -> None:
+        """Initialize the formatter.
+        :param mode: The formatter to use, one of `FORMATTERS`
+        :param line_length: The maximum line length of the black formatter
+        :param cache: The cache of formatted code, code is formatted every time if `None`
+        """
+        if mode not in FORMATTERS:
+            raise ValueError(f"Unsupported formatter '{mode}', expected one of {', '.join(FORMATTERS)}")
+
+        self.mode = mode
+        self.line_length = line_length
+        self.cache = cache
+
+    def cached(self, name: str, code: str, func: Callable[[str], str]) -> str:
+        """Run a formatting function through the cache of the formatter, if any.
+        :param name: The name and settings of the formatting function
+        :param code: The code to format
+        :param func: The formatting function
+        """
+        if self.cache is None:
+            return func(code)
+
+        return self.cache.get(name, code, func)
+
+    def format(self, code: str) -> str:
+        """Format Python code.
+        :param code: The code to format
+        :return: The formatted code, ending with a single newline
+        """
+        settings = f"{self.mode}|{self.line_length}"
+
+        if self.mode == "black":
+            import black
+
+            settings += f"|{black.__version__}"
+
+        return self.cached(settings, code, self._format)
+
+    def _format(self, code: str) -> str:
+        match self.mode:
+            case "black":
+                # Imported on demand, black is slow to import and only needed to export Python code
+                import black
+                from black import InvalidInput
+
+                try:
+                    return black.format_str(code, mode=black.FileMode(line_length=self.line_length))
+                except InvalidInput as error:
+                    logger.debug(f"Failed to format generated code with black: {error}")
+                    return self._normalize(code)
+            case "fast":
+                return self._normalize(code)
+            case _:
+                return code.rstrip() + "\n"
+
+    def format_value(self, value: Any) -> str:
+        """Format a Python literal, such as the content of a manifest.
+        :param value: The value to format
+        :return: The source code of the value, ending with a single newline
+        """
+        match self.mode:
+            case "black":
+                return self.format(repr(value))
+            case "fast":
+                return pformat(value, width=self.line_length, sort_dicts=False) + "\n"
+            case _:
+                return repr(value) + "\n"
+
+    def _normalize(self, code: str) -> str:
+        """Strip trailing whitespace, keep two blank lines before top-level definitions and one blank line
+        at most elsewhere.
+        """
+        lines = [line.rstrip() for line in code.strip("\n").splitlines()]
+        formatted_lines: List[str] = []
+        blank_lines = 0
+
+        for line in lines:
+            if not line:
+                blank_lines += 1
+                continue
+
+            if formatted_lines:
+                if re.match(r"(class |def |async def |@)", line) and not formatted_lines[-1].startswith("@"):
+                    blank_lines = 2
+                else:
+                    blank_lines = min(blank_lines, 1 if line[0].isspace() else 2)
+
+                formatted_lines += [""] * blank_lines
+
+            formatted_lines.append(line)
+            blank_lines = 0
+
+        return "\n".join(formatted_lines) + "\n"
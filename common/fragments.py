@@ -0,0 +1,42 @@
+from typing import (
+    TYPE_CHECKING,
+    List,
+    NamedTuple,
+    Tuple,
+    Union,
+)
+
+
+if TYPE_CHECKING:
+    from lxml import etree
+
+
+class XmlFragment(NamedTuple):
+    """A record converted to a `<record>` element, appended as is to the tree of its file,
+    in the `<data noupdate="1">` section if `noupdate` is set.
+    """
+
+    element: "etree._Element"
+    noupdate: bool = False
+
+
+class CsvFragment(NamedTuple):
+    """Records converted to CSV rows, in the order of the columns of `header`."""
+
+    header: Tuple[str, ...]
+    rows: List[Tuple[str, ...]]
+
+
+class PythonFragment(NamedTuple):
+    """A model converted to the unformatted parts of its Python class, the fields and methods being indented
+    to the class body.
+    """
+
+    model: str
+    imports: str
+    class_def: str
+    fields: str
+    computes: str
+
+
+Fragment = Union[XmlFragment, CsvFragment, PythonFragment]
@@ -1,11 +1,16 @@
 import os
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, List, Tuple
 
 from odev.common.logging import logging
 from odev.common.version import OdooVersion
 
+from odev.plugins.odev_plugin_export.common.formatter import Formatter
+from odev.plugins.odev_plugin_export.common.odoo import XmlIdRegistry
+
+from .merge_buffer import MergeBuffer
+
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +18,19 @@ logger = logging.getLogger(__name__)
 class MergeBase(ABC):
     version: OdooVersion = None
     prettify: bool = False
-    xml_ids: List[Dict] = None
+    xml_ids: XmlIdRegistry = None
     migrate_code: bool = True
+    formatter: Formatter = None
 
     def __init__(
         self,
         version: OdooVersion = None,
-        xml_ids: List[Dict] = None,
+        xml_ids: XmlIdRegistry = None,
         path: Path = None,
         prettify: bool = False,
         migrate_code: bool = True,
+        buffer: MergeBuffer = None,
+        formatter: Formatter = None,
     ) -> None:
         """Initialize the Merger configuration."""
         self.version: OdooVersion = version
@@ -30,27 +38,97 @@ class MergeBase(ABC):
         self.xml_ids = xml_ids
         self.path = Path(os.getcwd() if not path else path)
         self.migrate_code = migrate_code
+        self.buffer = buffer if buffer is not None else MergeBuffer()
+        self.formatter = formatter or Formatter()
 
         if not self.path.exists():
             self.path.mkdir(parents=True)
 
-    def merge(self, module: str, code: str, model: str, record: dict, config: dict) -> tuple[Path, str]:
-        """Merge the code into the file, check if the file exists and merge the code if it does."""
+    def merge(self, module: str, code: Any, model: str, record: dict, config: dict) -> Tuple[Path, str]:
+        """Merge the code into the buffered content of its file, loading the file from disk
+        the first time it is met if it already exists.
+        :return: The path of the file the code was merged into and the key of the record in that file
+        """
         file_path, subfolder, file_name = self._get_file_info(config, record)
-        module_path = Path(file_path / module / subfolder)
+        file = Path(file_path / module / subfolder / file_name)
+        content = self._get_content(file)
+
+        if content is None or self.is_empty(content):
+            content = self._parse(code)
+        else:
+            content = self._merge(content, file_name, record, code)
+
+        self.buffer.set(file, self, content)
+
+        return file, self._key(record)
+
+    def remove(self, module: str, file_name: str, key: str) -> None:
+        """Remove a record from the content of a file, the file is deleted when flushed if no record is left.
+        :param module: The module of the file
+        :param file_name: The path of the file, relative to the module
+        :param key: The key of the record in the file, as returned by `merge`
+        """
+        file = Path(self.path / module / file_name)
+        content = self._get_content(file)
 
-        if not module_path.exists():
-            module_path.mkdir(parents=True)
+        if content is not None:
+            self.buffer.set(file, self, self._remove(content, key))
 
-        if Path(module_path / file_name).exists():
-            code = self._merge(module_path, file_name, record, code)
+    def flush(self, module: str) -> None:
+        """Write all the buffered files of a module to disk."""
+        self.buffer.flush(Path(self.path / module))
 
-        return (Path(module_path / file_name), code if type(code) == str else "\n\n".join(code))
+    def files(self, module: str, subfolder: str = "") -> List[Path]:
+        """List the files exported for a module, optionally restricted to a subfolder."""
+        return self.buffer.files(Path(self.path / module / subfolder))
+
+    def _get_content(self, file: Path) -> Any:
+        content = self.buffer.get(file)
+
+        if content is None and file.exists():
+            content = self._load(file)
+
+        return content
+
+    def _key(self, record: dict) -> str:
+        """Return the key identifying a record in the file it is merged into."""
+        return record.get("__xml_id", "")
 
     @abstractmethod
-    def _merge(self, file_path: Path, file_name: str, record: dict, code: str):
+    def _parse(self, code: Any) -> Any:
+        """Convert the code generated for a record to the in-memory content of a new file."""
+        raise NotImplementedError("Parse method must be implemented in subclass")
+
+    @abstractmethod
+    def _load(self, file: Path) -> Any:
+        """Load the in-memory content of a file already existing on disk."""
+        raise NotImplementedError("Load method must be implemented in subclass")
+
+    @abstractmethod
+    def _merge(self, content: Any, file_name: str, record: dict, code: Any) -> Any:
+        """Merge the code generated for a record into the in-memory content of a file."""
         raise NotImplementedError("Merge method must be implemented in subclass")
 
+    @abstractmethod
+    def _remove(self, content: Any, key: str) -> Any:
+        """Remove the record with the given key from the in-memory content of a file."""
+        raise NotImplementedError("Remove method must be implemented in subclass")
+
+    @abstractmethod
+    def is_empty(self, content: Any) -> bool:
+        """Whether the in-memory content of a file holds no record anymore."""
+        raise NotImplementedError("Is empty method must be implemented in subclass")
+
+    def write(self, file: Path, content: Any) -> None:
+        """Write the in-memory content of a file to disk."""
+        with open(file, "w") as f:
+            f.write(self.dump(content))
+
+    @abstractmethod
+    def dump(self, content: Any) -> str:
+        """Serialize the in-memory content of a file."""
+        raise NotImplementedError("Dump method must be implemented in subclass")
+
     def _get_file_info(self, config: dict, record: dict) -> tuple[Path, Any, str]:
         record_cp = record.copy()
         file_name = config.get("file_name_field", "name")
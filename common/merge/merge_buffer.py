@@ -0,0 +1,95 @@
+import threading
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from odev.common.logging import logging
+
+
+if TYPE_CHECKING:
+    from .merge_base import MergeBase
+
+
+logger = logging.getLogger(__name__)
+
+
+class MergeBuffer:
+    """In-memory content of the exported files, kept in the native form of their merger
+    (an lxml tree, CSV rows, Python source) until they are flushed to disk.
+
+    The buffer is shared by the modules of an export, which may be exported in parallel threads.
+    """
+
+    def __init__(self) -> None:
+        self._files: Dict[Path, Tuple["MergeBase", Any]] = {}
+        self._written: List[Path] = []
+        self._order: Dict[Path, int] = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, file_path: Path) -> bool:
+        return file_path in self._files
+
+    def get(self, file_path: Path) -> Optional[Any]:
+        """Return the buffered content of a file, if any."""
+        if file_path in self._files:
+            return self._files[file_path][1]
+
+        return None
+
+    def set(self, file_path: Path, merger: "MergeBase", content: Any) -> None:
+        """Buffer the content of a file along with the merger able to serialize it."""
+        with self._lock:
+            self._files[file_path] = (merger, content)
+            self._order.setdefault(file_path, len(self._order))
+
+    def add_written(self, files: List[Path]) -> None:
+        """Register files already written to disk by a previous export."""
+        with self._lock:
+            for file_path in files:
+                if file_path not in self._written:
+                    self._written.append(file_path)
+                    self._order.setdefault(file_path, len(self._order))
+
+    def files(self, root_path: Path) -> List[Path]:
+        """List the files under a given path, in the order they were first buffered,
+        whether they were already flushed or not.
+        """
+        with self._lock:
+            files = [path for path in self._written if path.is_relative_to(root_path) and path not in self._files]
+            files += [
+                path
+                for path, (merger, content) in self._files.items()
+                if path.is_relative_to(root_path) and not merger.is_empty(content)
+            ]
+            return sorted(files, key=lambda path: self._order.get(path, len(self._order)))
+
+    def flush(self, root_path: Path) -> None:
+        """Write the buffered files under a given path to disk, then release them from memory."""
+        with self._lock:
+            files = {path: self._files.pop(path) for path in list(self._files) if path.is_relative_to(root_path)}
+
+        for file_path, (merger, content) in files.items():
+            if merger.is_empty(content):
+                file_path.unlink(missing_ok=True)
+
+                with self._lock:
+                    if file_path in self._written:
+                        self._written.remove(file_path)
+
+                continue
+
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            merger.write(file_path, content)
+
+            with self._lock:
+                if file_path not in self._written:
+                    self._written.append(file_path)
+
+        logger.debug(f"Flushed {len(files)} files to {root_path}")
@@ -1,12 +1,128 @@
+import csv
+from io import StringIO
 from pathlib import Path
+from typing import (
+    IO,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from odev.plugins.odev_plugin_export.common.fragments import CsvFragment
 
 from .merge_base import MergeBase
 
 
+class CsvRows:
+    """Rows of a CSV data file, deduplicated by the value of their `id` column.
+
+    Rows of a file already on disk are never loaded: new rows are appended to it and rows replaced or removed
+    are filtered out while the file is copied, line by line, when it is written.
+    """
+
+    def __init__(self, header: Sequence[str], source: Path = None) -> None:
+        """Initialize the rows of a file.
+        :param header: The columns of the file
+        :param source: The file already on disk the rows are appended to, if any
+        """
+        self.header = tuple(header)
+        self.source = source
+        self.rows: Dict[str, Sequence[str]] = {}
+        self.removed: Set[str] = set()
+        self._index: Optional[int] = self.header.index("id") if "id" in self.header else None
+
+    def add(self, rows: List[Sequence[str]]) -> None:
+        """Add rows to the file, replacing the previous version of the rows with the same id if any."""
+        for row in rows:
+            key = row[self._index] if self._index is not None else str(len(self.rows))
+            self.rows.pop(key, None)
+            self.rows[key] = row
+            self.removed.discard(key)
+
+    def remove(self, key: str) -> None:
+        """Remove the row with a given id from the file."""
+        if self._index is None:
+            return
+
+        self.rows.pop(key, None)
+
+        if self.source is not None:
+            self.removed.add(key)
+
+    def is_empty(self) -> bool:
+        if self.rows:
+            return False
+
+        return next(self._source_rows(), None) is None
+
+    def write(self, output: IO[str]) -> None:
+        """Write the header and the rows of the file, rows of the source file being replaced in place."""
+        writer = csv.writer(output)
+        writer.writerow(self.header)
+        written: Set[str] = set()
+
+        for row in self._source_rows():
+            key = row[self._index] if self._index is not None else None
+
+            if key in self.rows:
+                written.add(key)
+                writer.writerow(self.rows[key])
+            else:
+                writer.writerow(row)
+
+        writer.writerows(row for key, row in self.rows.items() if key not in written)
+
+    def _source_rows(self) -> Iterator[List[str]]:
+        """Iterate over the rows of the source file still in the file, skipping its header."""
+        if self.source is None or not self.source.exists():
+            return
+
+        with open(self.source, newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+
+            for row in reader:
+                if self._index is None or self._index >= len(row) or row[self._index] not in self.removed:
+                    yield row
+
+
 class MergeCsv(MergeBase):
-    def _merge(self, file_path: Path, file_name: str, record: dict, code: str):
-        with open(Path(file_path / file_name)) as f:
-            csv_text = f.read()
+    def _parse(self, code: CsvFragment) -> CsvRows:
+        content = CsvRows(code.header)
+        content.add(code.rows)
+        return content
+
+    def _load(self, file: Path) -> CsvRows:
+        # Only the header is read, rows are appended to the file
+        with open(file, newline="") as f:
+            header: List[str] = next(csv.reader(f), [])
+
+        return CsvRows(header, file)
+
+    def _merge(self, content: CsvRows, file_name: str, record: dict, code: CsvFragment) -> CsvRows:
+        content.add(code.rows)
+        return content
+
+    def _remove(self, content: CsvRows, key: str) -> CsvRows:
+        content.remove(key)
+        return content
+
+    def is_empty(self, content: CsvRows) -> bool:
+        return content.is_empty()
+
+    def write(self, file: Path, content: CsvRows) -> None:
+        # The source file is streamed while written, write to a temporary file before replacing it
+        temp_file = file.with_suffix(f"{file.suffix}.tmp")
+
+        with open(temp_file, "w", newline="") as f:
+            content.write(f)
+
+        temp_file.replace(file)
 
-        # Remove the header from the generated csv files
-        return csv_text + "\n" + "\n".join(code.split("\n")[1:])
+    def dump(self, content: CsvRows) -> str:
+        output = StringIO()
+        content.write(output)
+        return output.getvalue()
@@ -1,36 +1,91 @@
 from pathlib import Path
-from typing import Type, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Tuple,
+    Type,
+    Union,
+)
 
 from odev.common.logging import logging
 
 from .merge_base import MergeBase
-from .merge_csv import MergeCsv
-from .merge_python import MergePython
-from .merge_xml import MergeXml
+
+
+if TYPE_CHECKING:
+    from .merge_csv import MergeCsv
+    from .merge_python import MergePython
+    from .merge_xml import MergeXml
+    from .merge_xml_stream import MergeXmlStream
 
 
 logger = logging.getLogger(__name__)
 
-MergeType = Type[Union[MergePython, MergeXml, MergeCsv]]
+MergeType = Type[Union["MergePython", "MergeXml", "MergeXmlStream", "MergeCsv"]]
 
 
 class MergeFactory(MergeBase):
-    def merge(self, module: str, code: str, model: str, record: dict, config: dict) -> tuple[Path, str]:
-        merge_cls: MergeType = None
-
-        match config["format"]:
-            case "py":
-                merge_cls = MergePython
-            case "xml":
-                merge_cls = MergeXml
-            case "csv":
-                merge_cls = MergeCsv
-            case _:
-                raise ValueError("Unsupported data type")
-
-        return merge_cls(self.version, self.xml_ids, self.path, self.prettify).merge(
-            module, code, model, record, config
-        )
-
-    def _merge(self, file_path: Path, file_name: str, record: dict, code: str):
+    def __init__(self, *args, stream_xml: bool = False, **kwargs) -> None:
+        """Initialize the Merger configuration.
+        :param stream_xml: Whether new XML files are written incrementally rather than kept in memory
+        """
+        super().__init__(*args, **kwargs)
+        self.stream_xml = stream_xml
+        self._mergers: Dict[str, MergeBase] = {}
+
+    def merge(self, module: str, code: Any, model: str, record: dict, config: dict) -> Tuple[Path, str]:
+        return self._get_merger(config["format"]).merge(module, code, model, record, config)
+
+    def remove(self, module: str, file_name: str, key: str) -> None:
+        return self._get_merger(Path(file_name).suffix[1:]).remove(module, file_name, key)
+
+    def _get_merger(self, file_format: str) -> MergeBase:
+        """Return the merger for a given format, sharing the output buffer of the factory."""
+        if file_format not in self._mergers:
+            merge_cls: MergeType = None
+
+            # Mergers are imported on demand, along with their formatting dependencies (isort, lxml)
+            match file_format:
+                case "py":
+                    from .merge_python import MergePython
+
+                    merge_cls = MergePython
+                case "xml" if self.stream_xml:
+                    from .merge_xml_stream import MergeXmlStream
+
+                    merge_cls = MergeXmlStream
+                case "xml":
+                    from .merge_xml import MergeXml
+
+                    merge_cls = MergeXml
+                case "csv":
+                    from .merge_csv import MergeCsv
+
+                    merge_cls = MergeCsv
+                case _:
+                    raise ValueError("Unsupported data type")
+
+            self._mergers[file_format] = merge_cls(
+                self.version, self.xml_ids, self.path, self.prettify, self.migrate_code, self.buffer, self.formatter
+            )
+
+        return self._mergers[file_format]
+
+    def _parse(self, code: Any) -> Any:
+        raise NotImplementedError("Parse method must be implemented in subclass")
+
+    def _load(self, file: Path) -> Any:
+        raise NotImplementedError("Load method must be implemented in subclass")
+
+    def _merge(self, content: Any, file_name: str, record: dict, code: Any) -> Any:
         raise NotImplementedError("Merge method must be implemented in subclass")
+
+    def _remove(self, content: Any, key: str) -> Any:
+        raise NotImplementedError("Remove method must be implemented in subclass")
+
+    def is_empty(self, content: Any) -> bool:
+        raise NotImplementedError("Is empty method must be implemented in subclass")
+
+    def dump(self, content: Any) -> str:
+        raise NotImplementedError("Dump method must be implemented in subclass")
@@ -1,61 +1,203 @@
-import re
-import textwrap
+import ast
 from pathlib import Path
+from typing import Dict, List, Optional, Union
 
 import isort
 
-from .merge_base import MergeBase
-
-
-class MergePython(MergeBase):
-    def _merge(self, file_path: Path, file_name: str, record: dict, code: str):
-        with open(Path(file_path / file_name), "r") as f:
-            text = f.read()
-
-        # Find the class name, find the latest field and add the new fields + compute after it
-        def find_last_field_line(text, class_name):
-            # Find the class definition
-            class_pattern = rf"\s*?(_name|_inherit) = ['\"]{class_name}['\"](.*?)(?=class \w|\Z)"
-            class_match = re.search(class_pattern, text, re.DOTALL)
-
-            if class_match:
-                class_body = class_match.group(1)
-
-                # Find the last field line
-                field_pattern = r"^\s*?\w+ = fields\..*?\)$"
-                field_lines = re.findall(field_pattern, class_body, re.MULTILINE | re.DOTALL)
+from odev.common.logging import logging
 
-                if field_lines:
-                    last_field_line = field_lines[-1].split("\n")[-1]
+from odev.plugins.odev_plugin_export.common.fragments import PythonFragment
 
-                    # Find the line number of the last field line
-                    line_number = text[: text.rfind(last_field_line)].count("\n") + 1
-                    text[: text.rfind('help="Total number of records in this model"')]
-                    return last_field_line, line_number
-
-            return None, None
-
-        def replace_import(text, source):
-            pattern = r"^(import .*|from .*|^\s*$)*"
-            import_lines = re.findall(pattern, text, re.MULTILINE)
-            imports_str = "\n".join(import_lines).strip()
-
-            new_import = []
-            for line in source.split("\n"):
-                if line not in imports_str:
-                    new_import.append(line)
-
-            sorted_imports = isort.code(imports_str + "\n" + "\n".join(new_import))
-
-            return text.replace(imports_str, sorted_imports)
+from .merge_base import MergeBase
 
-        # Adding import on the top, isort will clean them up
-        text = replace_import(text, code[0])
 
-        _, line_number = find_last_field_line(text, record["model"])
+logger = logging.getLogger(__name__)
+
+
+class PythonClass:
+    """Source of a model class, split in sections so that fields and methods are appended without
+    searching the class again: the head of the class up to its last field, the fields merged after it,
+    the rest of the class and the computed methods merged after it.
+    """
 
-        lines = text.split("\n")
+    def __init__(self, head: str, body: str = "") -> None:
+        self.head = head
+        self.body = body
+        self.fields: List[str] = []
+        self.computes: List[str] = []
+
+    def merge(self, fields: str, computes: str) -> None:
+        """Add fields and methods, already indented to the class body, to the class."""
+        if fields.strip():
+            self.fields.append(fields)
+
+        if computes.strip():
+            self.computes.append(computes)
+
+    def dump(self) -> str:
+        fields = "\n".join(section.rstrip() for section in [self.head, *self.fields] if section.strip())
+        methods = [section.strip("\n").rstrip() for section in [self.body, *self.computes] if section.strip()]
+        return "\n\n".join([fields, *methods])
+
+
+class PythonFile:
+    """Content of a Python file, with its import statements collected in a single set and its classes indexed
+    by model, so that merging a model costs the same whatever the size of the file and imports are sorted
+    once when the file is dumped. Comments heading the file, such as a license, are kept before the imports.
+    """
+
+    def __init__(self) -> None:
+        self.header = ""
+        self.imports: Dict[str, str] = {}
+        self.blocks: List[Union[str, PythonClass]] = []
+        self.classes: Dict[str, PythonClass] = {}
+
+    @classmethod
+    def parse(cls, source: str) -> "PythonFile":
+        """Split the source of an existing file into imports, model classes and other top-level code."""
+        content = cls()
+        lines = source.splitlines()
+        nodes = ast.parse(source).body
+        starts = [cls._start(node) for node in nodes]
+
+        if nodes and starts[0] > 1:
+            content.header = "\n".join(lines[: starts[0] - 1])
+
+        for index, node in enumerate(nodes):
+            # Comments and blank lines up to the next statement are kept along with the current one
+            end = starts[index + 1] - 1 if index + 1 < len(nodes) else len(lines)
+            code = "\n".join(lines[starts[index] - 1 : end])
+
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                content._add_import(node, source)
+            elif isinstance(node, ast.ClassDef) and (model := cls._model(node)):
+                split = cls._split(node) - starts[index] + 1
+                code_lines = code.split("\n")
+                content.add_class(model, PythonClass("\n".join(code_lines[:split]), "\n".join(code_lines[split:])))
+            elif code.strip():
+                content.blocks.append(code)
+
+        return content
+
+    def add_imports(self, imports: str) -> None:
+        for node in ast.parse(imports).body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                self._add_import(node, imports)
+
+    def _add_import(self, node: Union[ast.Import, ast.ImportFrom], source: str) -> None:
+        """Add an import statement, whole even if wrapped over several lines, unless the same names are
+        already imported the same way, whatever the layout of the statement.
+        """
+        self.imports.setdefault(ast.dump(node), ast.get_source_segment(source, node))
+
+    def add_class(self, model: str, python_class: PythonClass) -> None:
+        self.classes[model] = python_class
+        self.blocks.append(python_class)
+
+    def merge(self, code: PythonFragment) -> None:
+        """Add the code generated for a model, into its class if already in the file."""
+        self.add_imports(code.imports)
+
+        if code.model not in self.classes:
+            self.add_class(code.model, PythonClass(code.class_def))
+
+        self.classes[code.model].merge(code.fields, code.computes)
+
+    def remove(self, model: str) -> None:
+        """Remove the class of a model, along with the whole content of the file if no class is left."""
+        if (python_class := self.classes.pop(model, None)) is None:
+            return
+
+        self.blocks.remove(python_class)
+
+        if not self.classes:
+            self.header = ""
+            self.imports.clear()
+            self.blocks.clear()
+
+    def is_empty(self) -> bool:
+        return not self.blocks
+
+    @staticmethod
+    def _start(node: ast.stmt) -> int:
+        """The first line of a statement, including its decorators."""
+        return min([node.lineno, *(decorator.lineno for decorator in getattr(node, "decorator_list", []))])
+
+    @staticmethod
+    def _model(node: ast.ClassDef) -> Optional[str]:
+        """The model defined by a class, from its `_name` or else its `_inherit` attribute."""
+        attributes: Dict[str, str] = {}
+
+        for stmt in node.body:
+            if (
+                isinstance(stmt, ast.Assign)
+                and isinstance(stmt.value, ast.Constant)
+                and isinstance(stmt.value.value, str)
+            ):
+                for target in stmt.targets:
+                    if isinstance(target, ast.Name) and target.id in ("_name", "_inherit"):
+                        attributes.setdefault(target.id, stmt.value.value)
+
+        return attributes.get("_name") or attributes.get("_inherit")
+
+    @classmethod
+    def _split(cls, node: ast.ClassDef) -> int:
+        """The line after which fields are merged in a class: its last field, else its last attribute
+        before any method, else its header.
+        """
+        split = cls._start(node.body[0]) - 1
+
+        for stmt in node.body:
+            if not isinstance(stmt, (ast.Assign, ast.AnnAssign, ast.Expr)):
+                break
+
+            split = stmt.end_lineno
+
+        for stmt in node.body:
+            if (
+                isinstance(stmt, ast.Assign)
+                and isinstance(stmt.value, ast.Call)
+                and isinstance(stmt.value.func, ast.Attribute)
+                and isinstance(stmt.value.func.value, ast.Name)
+                and stmt.value.func.value.id == "fields"
+            ):
+                split = max(split, stmt.end_lineno)
+
+        return split
 
-        lines.insert(line_number or len(lines), textwrap.indent(f"{code[2]}\n{code[3]}", "    "))
 
-        return "\n".join(lines)
+class MergePython(MergeBase):
+    def _parse(self, code: PythonFragment) -> PythonFile:
+        content = PythonFile()
+        content.merge(code)
+        return content
+
+    def _load(self, file: Path) -> PythonFile:
+        with open(file, "r") as f:
+            source = f.read()
+
+        try:
+            return PythonFile.parse(source)
+        except SyntaxError as e:
+            raise ValueError(f'Failed parsing python file "{file}", caused by {e}') from e
+
+    def _merge(self, content: PythonFile, file_name: str, record: dict, code: PythonFragment) -> PythonFile:
+        content.merge(code)
+        return content
+
+    def _remove(self, content: PythonFile, key: str) -> PythonFile:
+        content.remove(key)
+        return content
+
+    def is_empty(self, content: PythonFile) -> bool:
+        return content.is_empty()
+
+    def _key(self, record: dict) -> str:
+        return record["model"]
+
+    def dump(self, content: PythonFile) -> str:
+        # Imports are sorted and the whole file is formatted once, when written
+        imports = self.formatter.cached(f"isort|{isort.__version__}", "\n".join(content.imports.values()), isort.code)
+        blocks = [block.dump() if isinstance(block, PythonClass) else block for block in content.blocks]
+        blocks = [content.header, imports, *blocks]
+        return self.formatter.format("\n\n\n".join(block.strip("\n") for block in blocks if block.strip()))
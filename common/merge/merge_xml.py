@@ -1,59 +1,114 @@
 from pathlib import Path
+from typing import Dict, Optional
 
 from lxml import etree as ET
 
 from odev.common.logging import logging
 
+from odev.plugins.odev_plugin_export.common.fragments import XmlFragment
+
 from .merge_base import MergeBase
 
 
 logger = logging.getLogger(__name__)
 
 
-class MergeXml(MergeBase):
-    def _merge(self, file_path: Path, file_name: str, record: dict, code: str):
+class XmlTree:
+    """Tree of an XML data file, with an index of its records by id and of its noupdate section
+    kept up to date as records are merged, so that no XPath is evaluated on the whole file for each record.
+    """
 
-        try:
-            parser = ET.XMLParser(remove_blank_text=True, strip_cdata=False)
+    def __init__(self, root: ET._Element) -> None:
+        self.root = root
+        self.records: Dict[str, ET._Element] = {}
+        self.noupdate: Optional[ET._Element] = None
+
+        sections = [root, *root.iterchildren("data")]
+
+        for section in sections:
+            for elem in section.iterchildren():
+                if (record_id := elem.get("id")) is not None:
+                    self.records.setdefault(record_id, elem)
+
+        # Records are only merged into the first section of the file, if it is a noupdate one
+        if len(sections) > 1 and sections[1].get("noupdate"):
+            self.noupdate = sections[1]
+
+    def noupdate_section(self) -> ET._Element:
+        """Return the noupdate section of the file, inserted at its top if missing."""
+        if self.noupdate is None:
+            self.noupdate = ET.Element("data", {"noupdate": "1"})
+            self.root.insert(0, self.noupdate)
+            self.root.attrib.pop("noupdate", None)
+
+        return self.noupdate
 
-            code_root = ET.fromstring(code.encode(), parser)
-            file_root = ET.parse(Path(file_path / file_name), parser).getroot()
+    def merge(self, record: ET._Element, noupdate: bool = False) -> None:
+        """Add a record to the file, replacing the previous version of the record if any."""
+        record_id = record.get("id")
+        previous = self.records.get(record_id)
+        self.records[record_id] = record
 
-            file_ids = {elem.get("id") for elem in file_root.xpath("//odoo/* | //odoo/data/*") if elem.get("id")}
-            record = code_root.find(".//record")
-            record_id = record.get("id")
-            is_record_noupdate = bool(len(code_root.xpath("./data")) and code_root.find("./data").get("noupdate"))
+        if previous is None:
+            (self.noupdate_section() if noupdate else self.root).append(record)
+            return
 
-            if is_record_noupdate and (
-                not len(file_root.xpath("./data")) or not file_root.find("./data").get("noupdate")
-            ):
-                data = ET.Element("data", {"noupdate": "1"})
-                file_root.insert(0, data)
+        parent = previous.getparent()
 
-                file_root.attrib.pop("noupdate", None)
+        # Replace the previous version of the record, moving it to the noupdate section if needed
+        if noupdate and not parent.get("noupdate"):
+            parent.remove(previous)
+            self.noupdate_section().append(record)
+        else:
+            parent.replace(previous, record)
 
-            new_root = file_root.find("./data[@noupdate='1']") if is_record_noupdate else file_root
+    def remove(self, record_id: str) -> None:
+        """Remove a record from the file, along with its section if left empty."""
+        if (record := self.records.pop(record_id, None)) is None:
+            return
 
-            if record_id in file_ids:
-                file_record = file_root.find(f".//*[@id='{record_id}']")
-                record_parent_node = file_record.getparent()
+        parent = record.getparent()
+        parent.remove(record)
 
-                is_elem_noupdate = bool(record_parent_node.get("noupdate"))
+        if parent is not self.root and not len(parent):
+            self.root.remove(parent)
 
-                if is_record_noupdate and not is_elem_noupdate:
-                    record_parent_node.remove(file_record)
+            if parent is self.noupdate:
+                self.noupdate = None
 
-                    new_root.find("./data[@noupdate='1']").append(file_record)
-            else:
-                new_root.append(record)
 
-            code = ET.tostring(
-                file_root,
-                encoding="utf-8",
-                pretty_print=True,
-                xml_declaration=True,
-            ).decode("utf-8")
+class MergeXml(MergeBase):
+    parser = ET.XMLParser(remove_blank_text=True, strip_cdata=False)
+
+    def _parse(self, code: XmlFragment) -> XmlTree:
+        tree = XmlTree(ET.Element("odoo"))
+        tree.merge(code.element, code.noupdate)
+        return tree
 
-            return code
+    def _load(self, file: Path) -> XmlTree:
+        return XmlTree(ET.parse(file, self.parser).getroot())
+
+    def _merge(self, content: XmlTree, file_name: str, record: dict, code: XmlFragment) -> XmlTree:
+        try:
+            content.merge(code.element, code.noupdate)
+            return content
         except Exception as e:
-            raise ValueError(f'Failed merging xml in "{file_name}" with:\n{code}\ncaused by {e}') from e
+            code_xml = ET.tostring(code.element, encoding="unicode")
+            raise ValueError(f'Failed merging xml in "{file_name}" with:\n{code_xml}\ncaused by {e}') from e
+
+    def _remove(self, content: XmlTree, key: str) -> XmlTree:
+        content.remove(key)
+        return content
+
+    def is_empty(self, content: XmlTree) -> bool:
+        return not len(content.root)
+
+    def dump(self, content: XmlTree) -> str:
+        ET.indent(content.root, space=" " * 4)
+
+        return ET.tostring(
+            content.root,
+            encoding="utf-8",
+            pretty_print=True,
+            xml_declaration=True,
+        ).decode("utf-8")
@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from contextlib import ExitStack
+from io import BufferedWriter
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+from lxml import etree as ET
+
+from odev.common.logging import logging
+
+from odev.plugins.odev_plugin_export.common.fragments import XmlFragment
+
+from .merge_xml import MergeXml, XmlTree
+
+
+logger = logging.getLogger(__name__)
+
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+INDENT = " " * 4
+
+
+class XmlStreamWriter:
+    """Records of an XML data file serialized incrementally, as they are merged.
+
+    Records are written with lxml's incremental writer to two spooled temporary files, one for the records
+    in the `<data noupdate="1">` section and one for the other records, kept in memory up to `max_size` bytes
+    each and on disk past that. Both sections are joined when the file is written, the noupdate section first.
+    """
+
+    def __init__(self, max_size: int = 1024 * 1024) -> None:
+        """Initialize the writer.
+        :param max_size: The size of a section kept in memory before it is rolled over to disk, in bytes
+        """
+        self.max_size = max_size
+        self.count = 0
+        self._sections: Dict[bool, Tuple["tempfile.SpooledTemporaryFile[bytes]", Any]] = {}
+        self._stack = ExitStack()
+
+    def write(self, record: ET._Element, noupdate: bool = False) -> None:
+        """Serialize a record at the end of its section.
+        :param record: The `<record>` element
+        :param noupdate: Whether the record belongs to the noupdate section
+        """
+        level = 2 if noupdate else 1
+        writer = self._section(noupdate)
+
+        record.tail = None
+        ET.indent(record, space=INDENT, level=level)
+        writer.write(f"\n{INDENT * level}")
+        writer.write(record)
+        self.count += 1
+
+    def dump(self, file: Path) -> None:
+        """Close the sections and write them to a file, then release them."""
+        for noupdate, (_, writer) in self._sections.items():
+            writer.write(f"\n{INDENT if noupdate else ''}")
+
+        self._stack.close()
+
+        with open(file, "wb") as f:
+            f.write(XML_DECLARATION + b"<odoo>")
+
+            if True in self._sections:
+                f.write(f"\n{INDENT}".encode())
+                self._copy(self._sections[True][0], f)
+
+            if False in self._sections:
+                # Skip the opening tag of the section, already written
+                self._copy(self._sections[False][0], f, len(b"<odoo>"))
+            else:
+                f.write(b"\n</odoo>")
+
+            f.write(b"\n")
+
+        for spool, _ in self._sections.values():
+            spool.close()
+
+        self._sections = {}
+
+    def _section(self, noupdate: bool) -> Any:
+        if noupdate not in self._sections:
+            spool = tempfile.SpooledTemporaryFile(max_size=self.max_size)
+            xmlfile = self._stack.enter_context(ET.xmlfile(spool, encoding="utf-8"))
+            self._stack.enter_context(
+                xmlfile.element("data", {"noupdate": "1"}) if noupdate else xmlfile.element("odoo")
+            )
+            self._sections[noupdate] = (spool, xmlfile)
+
+        return self._sections[noupdate][1]
+
+    def _copy(self, spool: "tempfile.SpooledTemporaryFile[bytes]", file: BufferedWriter, offset: int = 0) -> None:
+        spool.seek(offset)
+        shutil.copyfileobj(spool, file)
+
+
+class MergeXmlStream(MergeXml):
+    """Merge XML records by streaming them to their file instead of keeping the whole file tree in memory,
+    so that large data files are written in constant memory and linear time.
+
+    Only new files are streamed, records merged into files already on disk go through `MergeXml`.
+    """
+
+    def merge(self, module: str, code: XmlFragment, model: str, record: dict, config: dict) -> Tuple[Path, str]:
+        file_path, subfolder, file_name = self._get_file_info(config, record)
+        file = Path(file_path / module / subfolder / file_name)
+        content = self.buffer.get(file)
+
+        if content is None and not file.exists():
+            content = XmlStreamWriter()
+
+        if not isinstance(content, XmlStreamWriter):
+            return super().merge(module, code, model, record, config)
+
+        content.write(code.element, code.noupdate)
+
+        self.buffer.set(file, self, content)
+
+        return file, self._key(record)
+
+    def _remove(self, content: Union[XmlTree, XmlStreamWriter], key: str) -> Any:
+        # Streamed files only hold records exported by the current run, which are never removed
+        if isinstance(content, XmlStreamWriter):
+            return content
+
+        return super()._remove(content, key)
+
+    def is_empty(self, content: Union[XmlTree, XmlStreamWriter]) -> bool:
+        if isinstance(content, XmlStreamWriter):
+            return not content.count
+
+        return super().is_empty(content)
+
+    def write(self, file: Path, content: Union[XmlTree, XmlStreamWriter]) -> None:
+        if isinstance(content, XmlStreamWriter):
+            return content.dump(file)
+
+        return super().write(file, content)
@@ -1,6 +1,20 @@
 import keyword
 import re
-from typing import Dict, List, TypedDict
+import threading
+from collections import defaultdict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+)
 
 
 DEFAULT_MODULE_LIST = ["__export_module__", "studio_customization"]
@@ -9,32 +23,194 @@ RecordMetaData = TypedDict(
     "RecordMetaData", {"xml_id": str, "noupdate": bool, "model": str, "name": str, "module": str, "res_id": float}
 )
 
+XML_ID_FIELDS = ["res_id", "noupdate", "name", "module", "model"]
+
+
+def search_read_paginated(
+    model: Any, domain: List, fields: List[str], page_size: int = 10000
+) -> Generator[List[dict], None, None]:
+    """Read all the records matching a domain, page by page, walking the table by increasing id ranges
+    rather than by offset so that each page is an index range scan on the server.
+    :param model: The RPC proxy of the model to read
+    :param domain: The domain to filter the records
+    :param fields: The fields to read
+    :param page_size: The maximum number of records per page
+    :return: A generator of pages of records
+    """
+    last_id = 0
+
+    while True:
+        page = model.search_read(domain + [("id", ">", last_id)], fields=fields, order="id", limit=page_size)
+
+        if page:
+            yield page
+
+        if len(page) < page_size:
+            break
+
+        last_id = page[-1]["id"]
+
+
+class XmlIdRegistry:
+    """Index of the `ir.model.data` records of a database, filled incrementally during an export.
+
+    Records are indexed by `(model, res_id)` and by `(module, name)` so that resolving the XML ID
+    of a record is a constant-time lookup, whatever the number of XML IDs in the database.
+    XML IDs of records that were not loaded upfront are fetched on demand through `loader`,
+    once per record.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[dict] = None,
+        loader: Callable[[str, List[int]], Iterable[dict]] = None,
+    ) -> None:
+        self.loader = loader
+        self._by_record: Dict[Tuple[str, int], dict] = {}
+        self._by_name: Dict[Tuple[str, str], dict] = {}
+        self._by_model: Dict[str, List[dict]] = defaultdict(list)
+        self._loaded: Set[int] = set()
+        self._checked: Set[Tuple[str, int]] = set()
+        self._lock = threading.RLock()
+
+        for record in records or []:
+            self.add(record)
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._by_model.values())
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        return key in self._by_record
+
+    def add(self, record: dict) -> None:
+        """Register an `ir.model.data` record.
+        When a record has several XML IDs, the oldest one (lowest `ir.model.data` id) is kept for resolution.
+        :param record: The `ir.model.data` record, as returned by `search_read`
+        """
+        if record.get("id") in self._loaded:
+            return
+
+        if "id" in record:
+            self._loaded.add(record["id"])
+
+        self._by_model[record["model"]].append(record)
+        self._by_name[(record["module"], record["name"])] = record
+
+        key = (record["model"], record["res_id"])
+        self._checked.add(key)
+        existing = self._by_record.get(key)
+
+        if existing is None or record.get("id", 0) < existing.get("id", 0):
+            self._by_record[key] = record
+
+    def prefetch(self, model: str, ids: Iterable[int]) -> None:
+        """Fetch the XML IDs of the given records that were never looked up, in a single call to the loader.
+        Errors of the loader are raised, the records being left to look up again.
+        :param model: The model of the records
+        :param ids: The ids of the records
+        """
+        with self._lock:
+            missing = list(dict.fromkeys(id_ for id_ in ids or [] if id_ and (model, id_) not in self._checked))
+
+            if missing and self.loader is not None:
+                self.register(model, missing, self.loader(model, missing))
+
+    def register(self, model: str, ids: Iterable[int], records: Iterable[dict]) -> None:
+        """Register the XML IDs fetched for the given records, records without XML ID are marked as looked up.
+        :param model: The model of the records
+        :param ids: The ids of the records that were looked up
+        :param records: The `ir.model.data` records found for them
+        """
+        with self._lock:
+            for record in records:
+                self.add(record)
 
-def get_xml_ids(
-    xml_ids, model: str = "", ids: List = None, rename_field: bool = False, module: str = ""
-) -> Dict[int, RecordMetaData]:
-    model_clean = model.replace(".", "_")
+            self._checked.update((model, id_) for id_ in ids)
 
-    default: Dict[int, RecordMetaData] = {
-        id: {
+    def is_known(self, model: str, res_id: int) -> bool:
+        """Whether the XML ID of a record was already looked up, whether it has one or not."""
+        return (model, res_id) in self._checked
+
+    def snapshot(self, keys: Iterable[Tuple[str, int]] = None) -> Dict[str, Any]:
+        """Export the content of the registry as JSON-serializable data, to be restored in a later run.
+        :param keys: The `(model, res_id)` of the records to export, all records if `None`
+        """
+        with self._lock:
+            if keys is None:
+                return {
+                    "records": [record for records in self._by_model.values() for record in records],
+                    "checked": [list(key) for key in self._checked],
+                }
+
+            keys = [key for key in dict.fromkeys(keys) if key in self._checked]
+
+            return {
+                "records": [record for key in keys if (record := self._by_record.get(key)) is not None],
+                "checked": [list(key) for key in keys],
+            }
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Fill the registry from a snapshot taken in a previous run."""
+        self.register("", [], snapshot["records"])
+
+        with self._lock:
+            self._checked.update((model, res_id) for model, res_id in snapshot["checked"])
+
+    def models(self) -> Iterator[str]:
+        """Iterate over the models having at least one XML ID."""
+        return iter(self._by_model.keys())
+
+    def records(self, model: str) -> List[dict]:
+        """Return all the `ir.model.data` records of a model."""
+        return self._by_model.get(model, [])
+
+    def res_ids(self, model: str) -> List[int]:
+        """Return the ids of all the records of a model having an XML ID."""
+        return [record["res_id"] for record in self.records(model)]
+
+    def find(self, model: str, res_id: int) -> Optional[dict]:
+        """Return the `ir.model.data` record of a given record, if any."""
+        return self._by_record.get((model, res_id))
+
+    def find_by_name(self, module: str, name: str) -> Optional[dict]:
+        """Return the `ir.model.data` record matching a fully qualified XML ID, if any."""
+        return self._by_name.get((module, name))
+
+    def get(self, model: str, res_id: int, module: str = "") -> RecordMetaData:
+        """Resolve the metadata of a single record.
+        :param model: The model of the record
+        :param res_id: The id of the record
+        :param module: The module being exported, XML IDs from this module are not prefixed
+        :return: The metadata of the record, with a generated XML ID if it has none in the database
+        """
+        metadata: RecordMetaData = {
             "model": model,
-            "name": f"{model_clean}_{str(id)}",
+            "name": f"{model.replace('.', '_')}_{str(res_id)}",
             "noupdate": False,
-            "module": "__export_module__",
+            "module": DEFAULT_MODULE_LIST[0],
             "xml_id": "",
-            "res_id": id,
+            "res_id": res_id,
         }
-        for id in ids
-    }
 
-    for xml_id in xml_ids[model]:
-        if xml_id["model"] == model and xml_id["res_id"] in ids:
-            default[xml_id["res_id"]].update(xml_id)
-            default[xml_id["res_id"]]["xml_id"] = (
+        self.prefetch(model, [res_id])
+
+        if (xml_id := self._by_record.get((model, res_id))) is not None:
+            metadata.update(xml_id)  # type: ignore
+            metadata["xml_id"] = (
                 f"{xml_id['module']}.{xml_id['name']}" if xml_id["module"] != module else xml_id["name"]
             )
 
-    return default
+        return metadata
+
+    def resolve(self, model: str, ids: Iterable[int], module: str = "") -> Dict[int, RecordMetaData]:
+        """Resolve the metadata of a batch of records of the same model.
+        :param model: The model of the records
+        :param ids: The ids of the records
+        :param module: The module being exported, XML IDs from this module are not prefixed
+        :return: The metadata of the records, by id
+        """
+        self.prefetch(model, ids)
+        return {id_: self.get(model, id_, module) for id_ in ids or []}
 
 
 def rename_field_base(field_name: str) -> str:
@@ -45,3 +221,32 @@ def rename_field_base(field_name: str) -> str:
             field_name = f"_{field_name}"
 
     return field_name
+
+
+class RenameMap:
+    """Names cleaned by `rename_field_base` for the whole export, each distinct name being cleaned once.
+
+    Only short values are kept, such as the technical names of models and fields repeated across records
+    and included records, long values such as view architectures or code being cleaned on each call.
+    """
+
+    def __init__(self, max_length: int = 128) -> None:
+        """Initialize the map.
+        :param max_length: The maximum length of the values kept in the map
+        """
+        self.max_length = max_length
+        self._names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get(self, name: Any) -> Any:
+        """Return the cleaned version of a name, values other than strings being returned as is."""
+        if not isinstance(name, str) or len(name) > self.max_length:
+            return rename_field_base(name)
+
+        # Names are cleaned the same in every thread, concurrent misses only compute the same value twice
+        if (renamed := self._names.get(name)) is None:
+            renamed = self._names[name] = rename_field_base(name)
+
+        return renamed
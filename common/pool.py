@@ -0,0 +1,150 @@
+import queue
+import threading
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+)
+
+from odev.common.logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Pool of RPC connections to a database, shared between the threads of an export.
+
+    A connection is any object returning RPC model proxies by model name, such as the `models`
+    connector of a database. Connections are created on demand by `factory`, up to `size`.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 1, connections: List[Any] = None) -> None:
+        """Initialize the pool.
+        :param factory: Callable creating a new connection
+        :param size: The maximum number of connections in the pool
+        :param connections: Already opened connections to add to the pool
+        """
+        self.factory = factory
+        self.size = max(size, len(connections or []), 1)
+        self._connections: List[Any] = list(connections or [])
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+        for connection in self._connections:
+            self._idle.put(connection)
+
+    @property
+    def models(self) -> "PooledModels":
+        """RPC model proxies acquiring a connection from the pool for each call."""
+        return PooledModels(self)
+
+    @contextmanager
+    def connection(self) -> Generator[Any, None, None]:
+        """Borrow a connection from the pool, waiting for one to be released if the pool is exhausted."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._create() or self._idle.get()
+
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def _create(self) -> Any:
+        with self._lock:
+            if len(self._connections) >= self.size:
+                return None
+
+            connection = self.factory()
+            self._connections.append(connection)
+
+        logger.debug(f"Opened RPC connection {len(self._connections)}/{self.size}")
+        return connection
+
+
+class PooledModels:
+    """Mapping of model names to RPC proxies bound to a connection pool."""
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        self.pool = pool
+
+    def __getitem__(self, model: str) -> "PooledModel":
+        return PooledModel(self.pool, model)
+
+
+class PooledModel:
+    """RPC proxy of a model running each call on a connection borrowed from a pool."""
+
+    def __init__(self, pool: ConnectionPool, model: str) -> None:
+        self.pool = pool
+        self.model = model
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        def call(*args, **kwargs):
+            with self.pool.connection() as connection:
+                return getattr(connection[self.model], method)(*args, **kwargs)
+
+        return call
+
+
+class _Done:
+    """Marker of the end of a background iteration."""
+
+
+class _Failure(NamedTuple):
+    """Exception raised by a background iteration, re-raised in the consumer thread."""
+
+    error: BaseException
+
+
+class BackgroundIterator:
+    """Run an iterable in a worker thread and buffer up to `maxsize` of its items ahead of the consumer.
+    The `future` of the worker is done once all the items are produced, or the iteration failed or was cancelled.
+    """
+
+    def __init__(self, executor: Executor, iterable_factory: Callable[[], Iterable[Any]], maxsize: int = 2) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._cancelled = threading.Event()
+        self.future = executor.submit(self._produce, iterable_factory)
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            while (item := self._queue.get()) is not _Done:
+                if isinstance(item, _Failure):
+                    raise item.error
+
+                yield item
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Stop the worker thread at the next item it produces."""
+        self._cancelled.set()
+
+    def _produce(self, iterable_factory: Callable[[], Iterable[Any]]) -> None:
+        try:
+            for item in iterable_factory():
+                if not self._put(item):
+                    return
+        except BaseException as error:
+            self._put(_Failure(error))
+        finally:
+            self._put(_Done)
+
+    def _put(self, item: Any) -> bool:
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
@@ -0,0 +1,360 @@
+import cProfile
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from odev.common.logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Stage, module and model a measure is recorded under, module and model being `None` when unknown
+StageKey = Tuple[str, Optional[str], Optional[str]]
+
+
+class StageStats:
+    """Cumulated measures of a stage."""
+
+    def __init__(self) -> None:
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+        self.rpc_bytes = 0
+        self.peak_memory = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "wall": round(self.wall, 6),
+            "cpu": round(self.cpu, 6),
+            "calls": self.calls,
+            "rpc_bytes": self.rpc_bytes,
+            "peak_memory": self.peak_memory,
+        }
+
+
+class _Frame:
+    """A running measure of a stage, in the thread running it."""
+
+    def __init__(self, key: StageKey) -> None:
+        self.key = key
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.memory = self.peak = 0
+        self.rpc_bytes = 0
+
+
+class ExportProfiler:
+    """Measure the wall time, CPU time, number of calls, RPC payload and peak memory of the stages of an export,
+    by model and by module, and write them to a JSON report.
+
+    Stages nested in a stage of the same name, such as the fetch of included records, are counted once
+    in the totals of the stage and of the module, and in the model including them as well as in their own model.
+    Stages running in parallel threads are summed. Peak memory is the highest growth of the memory traced
+    by `tracemalloc` while the stage runs, in bytes.
+
+    A disabled profiler measures nothing, its hooks being no-ops.
+    """
+
+    def __init__(self, enabled: bool = False, profile_calls: bool = False) -> None:
+        """Initialize the profiler.
+        :param enabled: Whether the stages are measured
+        :param profile_calls: Whether models are also profiled with cProfile, to dump the profile of the slowest
+        """
+        self.enabled = enabled
+        self.profile_calls = enabled and profile_calls
+        self.stats: Dict[StageKey, StageStats] = defaultdict(StageStats)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._frames: Set[_Frame] = set()
+        self._profiles: Dict[str, List[cProfile.Profile]] = defaultdict(list)
+        self._started_tracing = False
+        self._start: Tuple[float, float] = (0.0, 0.0)
+        self._peak = 0
+
+    def start(self) -> None:
+        """Start tracing memory allocations and measuring the total time of the export."""
+        if not self.enabled:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        self._start = (time.perf_counter(), time.process_time())
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop tracing memory allocations.
+        :return: The total wall time, CPU time and peak memory of the export
+        """
+        total = {
+            "wall": round(time.perf_counter() - self._start[0], 6),
+            "cpu": round(time.process_time() - self._start[1], 6),
+            "peak_memory": max(self._peak, tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0),
+        }
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        return total
+
+    def stage(self, name: str, module: str = None, model: str = None) -> ContextManager[None]:
+        """Measure a block of code as a stage of the export.
+        :param name: The name of the stage
+        :param module: The module exported, that of the enclosing stage if not given
+        :param model: The model exported, that of the enclosing stage if not given
+        """
+        if not self.enabled:
+            return nullcontext()
+
+        return self._measure(name, module, model)
+
+    def iterate(self, name: str, iterable: Iterable[Any], module: str = None, model: str = None) -> Iterable[Any]:
+        """Measure the iteration of an iterable as a stage, the code consuming its items being left out."""
+        if not self.enabled:
+            return iterable
+
+        def measured():
+            iterator = iter(iterable)
+
+            while True:
+                with self._measure(name, module, model):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+
+                yield item
+
+        return measured()
+
+    def wrap(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Measure the calls of a function as a stage."""
+        if not self.enabled:
+            return func
+
+        @wraps(func)
+        def measured(*args, **kwargs):
+            with self._measure(name, None, None):
+                return func(*args, **kwargs)
+
+        return measured
+
+    @contextmanager
+    def model(self, module: str, model: str) -> Generator[None, None, None]:
+        """Measure the export of a model, profiled with cProfile if requested."""
+        if not self.enabled:
+            yield
+            return
+
+        profile = self._enable_profile()
+
+        try:
+            with self._measure("export", module, model):
+                yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._local.profiling = False
+
+                with self._lock:
+                    self._profiles[model].append(profile)
+
+    def rpc(self, models: Any) -> Any:
+        """Wrap the RPC model proxies of a database to measure their calls and the size of their responses."""
+        return ProfiledModels(self, models) if self.enabled else models
+
+    def add_rpc_bytes(self, size: int) -> None:
+        """Count the size of an RPC response in the stages running in the current thread."""
+        for frame in self._stack():
+            frame.rpc_bytes += size
+
+    def report(self, path: Path) -> None:
+        """Write the JSON report of the export and log a summary of its stages, along with the cProfile
+        statistics of the slowest model, next to the report, if requested.
+        :param path: The file the report is written to
+        """
+        if not self.enabled:
+            return
+
+        total = self.stop()
+        stages: Dict[str, StageStats] = {}
+        models: Dict[str, Dict[str, StageStats]] = defaultdict(dict)
+        modules: Dict[str, Dict[str, StageStats]] = defaultdict(dict)
+
+        for (name, module, model), stats in self.stats.items():
+            if module is not None:
+                modules[module][name] = stats
+            elif model is not None:
+                models[model][name] = stats
+            else:
+                stages[name] = stats
+
+        report: Dict[str, Any] = {
+            "total": total,
+            "stages": {name: stats.to_dict() for name, stats in stages.items()},
+            "models": {model: {n: s.to_dict() for n, s in stats.items()} for model, stats in models.items()},
+            "modules": {module: {n: s.to_dict() for n, s in stats.items()} for module, stats in modules.items()},
+        }
+
+        if slowest := self._slowest_model(models):
+            report["slowest_model"] = slowest
+
+            if self._profiles.get(slowest):
+                profile_file = path.with_suffix(".prof")
+                pstats.Stats(*self._profiles[slowest]).dump_stats(profile_file)
+                report["profile"] = profile_file.as_posix()
+                logger.info(f"cProfile statistics of {slowest} export written to {profile_file}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+
+        for name, stats in sorted(stages.items(), key=lambda item: -item[1].wall):
+            logger.info(
+                f"{name}: {stats.wall:.2f} s wall, {stats.cpu:.2f} s CPU, {stats.calls} calls, "
+                f"{stats.rpc_bytes / 1024 / 1024:.1f} MiB over RPC, {stats.peak_memory / 1024 / 1024:.1f} MiB peak"
+            )
+
+        logger.info(f"Profiling report written to {path}")
+
+    @contextmanager
+    def _measure(self, name: str, module: Optional[str], model: Optional[str]) -> Generator[None, None, None]:
+        stack = self._stack()
+        context = getattr(self._local, "context", (None, None))
+        module = module if module is not None else context[0]
+        model = model if model is not None else context[1]
+        keys: List[StageKey] = [(name, None, None)]
+
+        # A stage is measured in total, by module and by model, each by the outermost frame of the stage
+        # with the same key only
+        if module is not None:
+            keys.append((name, module, None))
+
+        if model is not None:
+            keys.append((name, None, model))
+
+        frames = [_Frame(key) for key in keys if not any(frame.key == key for frame in stack)]
+        self._open(frames)
+        stack.extend(frames)
+        self._local.context = (module, model)
+
+        try:
+            yield
+        finally:
+            self._local.context = context
+
+            for frame in frames:
+                stack.remove(frame)
+
+            self._close(frames)
+
+    def _open(self, frames: List[_Frame]) -> None:
+        with self._lock:
+            memory = self._memory()
+
+            for frame in frames:
+                frame.memory = frame.peak = memory
+                self._frames.add(frame)
+
+    def _close(self, frames: List[_Frame]) -> None:
+        wall, cpu = time.perf_counter(), time.thread_time()
+
+        with self._lock:
+            self._memory()
+
+            for frame in frames:
+                self._frames.discard(frame)
+                stats = self.stats[frame.key]
+                stats.wall += wall - frame.wall
+                stats.cpu += cpu - frame.cpu
+                stats.calls += 1
+                stats.rpc_bytes += frame.rpc_bytes
+                stats.peak_memory = max(stats.peak_memory, frame.peak - frame.memory)
+
+    def _memory(self) -> int:
+        """Report the peak of traced memory since the last call to the running frames, then reset the peak
+        so that each frame only sees the peaks reached while it runs.
+        :return: The current traced memory
+        """
+        if not tracemalloc.is_tracing():
+            return 0
+
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self._peak = max(self._peak, peak)
+
+        for frame in self._frames:
+            frame.peak = max(frame.peak, peak)
+
+        return current
+
+    def _stack(self) -> List[_Frame]:
+        return self._local.__dict__.setdefault("stack", [])
+
+    def _enable_profile(self) -> Optional[cProfile.Profile]:
+        if not self.profile_calls or getattr(self._local, "profiling", False):
+            return None
+
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+        except ValueError:
+            # Only one profiler may run at once on some Python versions, the other threads are not profiled
+            return None
+
+        self._local.profiling = True
+        return profile
+
+    def _slowest_model(self, models: Dict[str, Dict[str, StageStats]]) -> Optional[str]:
+        exports = {model: stats["export"].wall for model, stats in models.items() if "export" in stats}
+        return max(exports, key=exports.__getitem__) if exports else None
+
+
+class ProfiledModels:
+    """Mapping of model names to RPC proxies measuring their calls as the `rpc` stage of a profiler."""
+
+    def __init__(self, profiler: ExportProfiler, models: Any) -> None:
+        self.profiler = profiler
+        self.models = models
+
+    def __getitem__(self, model: str) -> "ProfiledModel":
+        return ProfiledModel(self.profiler, self.models[model])
+
+
+class ProfiledModel:
+    """RPC proxy of a model measuring its calls and the size of their responses."""
+
+    def __init__(self, profiler: ExportProfiler, model: Any) -> None:
+        self.profiler = profiler
+        self.model = model
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        def call(*args, **kwargs):
+            with self.profiler.stage("rpc"):
+                result = getattr(self.model, method)(*args, **kwargs)
+                self.profiler.add_rpc_bytes(len(json.dumps(result, default=str)))
+
+            return result
+
+        return call
@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+)
+
+from odev.common.connectors.rpc import FieldsGetMapping
+from odev.common.logging import logging
+from odev.common.version import OdooVersion
+
+from odev.plugins.odev_plugin_export.common.converters.converter_base import ConverterBase
+from odev.plugins.odev_plugin_export.common.converters.converter_factory import ConverterFactory
+from odev.plugins.odev_plugin_export.common.formatter import Formatter
+from odev.plugins.odev_plugin_export.common.fragments import Fragment, XmlFragment
+from odev.plugins.odev_plugin_export.common.odoo import XmlIdRegistry
+
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPool:
+    """Convert chunks of records to code over a pool of processes, lxml, ast and black being CPU-bound.
+
+    A chunk is split in contiguous shards, one per worker. The XML IDs referenced by a shard are fetched
+    beforehand in the main process and sent to its worker along with the `fields_get` data, as a read-only
+    snapshot of the registry, workers never querying the database. Results are yielded in the order of the
+    records of the chunk so that the merged output is the same as when converted in a single process.
+    """
+
+    def __init__(self, workers: int, converter: ConverterBase, version: str, min_shard_size: int = 20) -> None:
+        """Initialize the pool.
+        :param workers: The number of worker processes
+        :param converter: The converter of the main process, whose settings are used by the workers and which
+            collects the dependencies found by the workers, snapshots of its registry of XML IDs are sent to them
+        :param version: The target version of the export
+        :param min_shard_size: The minimum number of records sent to a worker at once
+        """
+        self.workers = workers
+        self.converter = converter
+        self.xml_ids = converter.xml_ids
+        self.min_shard_size = min_shard_size
+        self.settings = (version, converter.migrate_code, converter.formatter.mode, converter.formatter.line_length)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def convert(
+        self,
+        records: List[dict],
+        fields_get: FieldsGetMapping,
+        default_get: dict,
+        model: str,
+        module: str,
+        config: dict,
+    ) -> Iterator[Tuple[dict, Fragment]]:
+        """Convert records in the worker processes, with the same signature and results as `ConverterBase.convert`.
+        Converted records are copies of the given records, updated by the converter.
+        """
+        shard_size = max(-(-len(records) // self.workers), self.min_shard_size)
+        futures = []
+
+        for index in range(0, len(records), shard_size):
+            shard = records[index : index + shard_size]
+            snapshot = self.xml_ids.snapshot(self._prefetch(shard, fields_get, model))
+            futures.append(
+                self.executor.submit(
+                    _convert, self.settings, snapshot, shard, fields_get, default_get, model, module, config
+                )
+            )
+
+        try:
+            for future in futures:
+                results, depends = future.result()
+                self.converter.add_depends(module, depends)
+
+                for record, fragment in results:
+                    yield record, _unpack(fragment)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+    def _prefetch(self, records: List[dict], fields_get: FieldsGetMapping, model: str) -> List[Tuple[str, int]]:
+        """Fetch the XML IDs of the records of a shard and of the records they reference, in the main process.
+        :return: The `(model, res_id)` of the records whose XML ID may be resolved by the converter
+        """
+        ids_by_model: Dict[str, Dict[int, None]] = {model: dict.fromkeys(record["id"] for record in records)}
+
+        for record in records:
+            for field, value in record.items():
+                if field in fields_get and (relation := fields_get[field].get("relation")) and value:
+                    values: Iterable[Any] = value if isinstance(value, list) else [value]
+                    ids_by_model.setdefault(relation, {}).update(dict.fromkeys(v for v in values if v))
+
+        for relation, ids in ids_by_model.items():
+            self.xml_ids.prefetch(relation, ids)
+
+        return [(relation, id_) for relation, ids in ids_by_model.items() for id_ in ids]
+
+
+def _convert(
+    settings: Tuple[str, bool, str, int],
+    snapshot: Dict[str, Any],
+    records: List[dict],
+    fields_get: FieldsGetMapping,
+    default_get: dict,
+    model: str,
+    module: str,
+    config: dict,
+) -> Tuple[List[Tuple[dict, Any]], Set[str]]:
+    """Convert a shard of records in a worker process.
+    :return: The converted records with their packed fragments and the modules the records depend on
+    """
+    version, migrate_code, formatter_mode, line_length = settings
+    xml_ids = XmlIdRegistry()
+    xml_ids.restore(snapshot)
+    converter = ConverterFactory(
+        version=OdooVersion(version),
+        xml_ids=xml_ids,
+        migrate_code=migrate_code,
+        formatter=Formatter(formatter_mode, line_length),
+    )
+    results = [
+        (record, _pack(fragment))
+        for record, fragment in converter.convert(records, fields_get, default_get, model, module, config)
+    ]
+
+    return results, converter.depends[module]
+
+
+def _pack(fragment: Fragment) -> Any:
+    """Make a fragment picklable, lxml elements are sent back to the main process serialized."""
+    if isinstance(fragment, XmlFragment):
+        from lxml import etree
+
+        return XmlFragment(etree.tostring(fragment.element, encoding="utf-8"), fragment.noupdate)
+
+    return fragment
+
+
+def _unpack(fragment: Any) -> Fragment:
+    if isinstance(fragment, XmlFragment) and isinstance(fragment.element, bytes):
+        from lxml import etree
+
+        return XmlFragment(etree.fromstring(fragment.element, etree.XMLParser(strip_cdata=False)), fragment.noupdate)
+
+    return fragment
@@ -0,0 +1,134 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Set,
+    Tuple,
+)
+
+from odev.common.connectors.rpc import FieldsGetMapping
+from odev.common.logging import logging
+
+from odev.plugins.odev_plugin_export.common.pool import BackgroundIterator
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExportScheduler:
+    """Run the export tasks of models concurrently, following the graph of the dependencies between models.
+
+    A task produces the results of a model one at a time, in a worker thread running ahead of the consumer
+    by at most `buffer_size` results, so that a model is never held in memory as a whole. A task starts once
+    the tasks of the models it depends on are done, with at most `max_in_flight` tasks running at once.
+    Results are yielded in the order the tasks were given, as soon as available, so that they are merged
+    in the same order as when exported one model after the other.
+    """
+
+    def __init__(self, max_in_flight: int = 2, buffer_size: int = 2) -> None:
+        """Initialize the scheduler.
+        :param max_in_flight: The maximum number of tasks running at once
+        :param buffer_size: The maximum number of results of a task produced ahead of the consumer
+        """
+        self.max_in_flight = max(max_in_flight, 1)
+        self.buffer_size = buffer_size
+
+    @staticmethod
+    def dependencies(
+        models: List[str], config: Mapping[str, dict], fields_get: Mapping[str, FieldsGetMapping]
+    ) -> Dict[str, Set[str]]:
+        """Build the graph of the dependencies between the export of models, from their priority, the models
+        they include and the comodels of their exported fields.
+
+        Models are exported in the order of the configuration, only the dependencies on models coming before
+        are kept, which keeps the graph acyclic.
+        :param models: The models to export, in order
+        :param config: The export configuration, by model
+        :param fields_get: The fields definition, by model
+        :return: The models each model depends on
+        """
+        graph: Dict[str, Set[str]] = {}
+
+        for index, model in enumerate(models):
+            model_config = config[model]
+            model_fields = fields_get.get(model) or {}
+            previous = set(models[:index])
+
+            targets = set(model_config.get("includes", {}))
+            targets |= {
+                str(model_fields[field]["relation"])
+                for field in model_config.get("fields") or model_fields.keys()
+                if field in model_fields and model_fields[field].get("relation")
+            }
+
+            if (priority := model_config.get("priority")) is not None:
+                targets |= {other for other in previous if config[other].get("priority", float("inf")) < priority}
+
+            graph[model] = (targets & previous) - {model}
+
+        return graph
+
+    def run(
+        self, tasks: List[Tuple[str, Callable[[], Iterable[Any]]]], dependencies: Mapping[str, Set[str]]
+    ) -> Generator[Tuple[str, Iterator[Any]], None, None]:
+        """Run tasks once their dependencies are done and yield their results in order.
+        Each run has its own worker threads, a task waiting for its results to be consumed never holds
+        the worker of a task of another run.
+        :param tasks: The tasks to run, as `(key, function)`, in order, each function returning an iterable
+        :param dependencies: The keys of the tasks each task depends on
+        :return: A generator of the keys of the tasks and of iterators over their results, to be consumed
+            before the next task is requested
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="export-task")
+        pending: Dict[str, Callable[[], Iterable[Any]]] = dict(tasks)
+        running: Dict[Future, str] = {}
+        streams: Dict[str, BackgroundIterator] = {}
+        completed: Set[str] = set()
+
+        def submit():
+            for key in list(pending):
+                if len(running) >= self.max_in_flight:
+                    break
+
+                if dependencies.get(key, set()) <= completed:
+                    streams[key] = BackgroundIterator(executor, pending.pop(key), self.buffer_size)
+                    running[streams[key].future] = key
+
+        def collect(timeout: float = None):
+            finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                completed.add(running.pop(future))
+
+            submit()
+
+        def consume(stream: BackgroundIterator) -> Iterator[Any]:
+            # Tasks finishing while the results are consumed are replaced right away
+            for result in stream:
+                yield result
+                collect(timeout=0)
+
+        try:
+            for key, _ in tasks:
+                submit()
+
+                while key not in streams:
+                    if not running:
+                        raise RuntimeError(f"Export task {key} depends on tasks that never run")
+
+                    collect()
+
+                stream = streams.pop(key)
+                yield key, consume(stream)
+                stream.cancel()
+        finally:
+            for stream in streams.values():
+                stream.cancel()
+
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from odev.common.logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExportState:
+    """State of the last incremental export of a module, stored along with the exported files.
+
+    Each exported record is stored with a version, computed from its last update and the last update of its
+    included records, and with the file and key it was merged into. The next export only re-renders the records
+    whose version changed and removes the records that no longer exist from their file. The dependencies of the
+    module are kept as well, since they are only collected from the exported records.
+    """
+
+    file_name = ".export_state.json"
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the state, loading the state of the last export if any.
+        :param path: The path of the exported module
+        """
+        self.path = Path(path)
+        self.file = self.path / self.file_name
+        self.models: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.versions: Dict[str, Dict[int, str]] = {}
+        self.previous: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.depends: List[str] = []
+
+        if self.file.exists():
+            try:
+                with open(self.file) as f:
+                    state = json.load(f)
+
+                self.models = state.get("models", {})
+                self.depends = state.get("depends", [])
+            except (OSError, ValueError) as error:
+                logger.warning(f"Ignoring unreadable export state {self.file}: {error}")
+
+    def files(self) -> List[Path]:
+        """List the files written by the last export, in the order they were first written."""
+        files = [self.path / entry["file"] for entries in self.models.values() for entry in entries.values()]
+        return list(dict.fromkeys(file for file in files if file != self.path))
+
+    def diff(self, model: str, versions: Dict[int, str]) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """Compare the current versions of the records of a model with the ones of the last export.
+        The entries of changed and deleted records are dropped from the state, the entries of changed records
+        are kept in `previous` until they are exported again.
+        :param model: The model of the records
+        :param versions: The current version of the records, by id
+        :return: The ids of the new and changed records, and the entries of the deleted records
+        """
+        self.versions[model] = versions
+        entries = self.models.setdefault(model, {})
+
+        changed = [id_ for id_, version in versions.items() if entries.get(str(id_), {}).get("version") != version]
+        stale = {key: entries.pop(key) for key in list(entries) if versions.get(int(key)) != entries[key]["version"]}
+        deleted = [stale.pop(key) for key in list(stale) if int(key) not in versions]
+        self.previous[model] = stale
+
+        return changed, deleted
+
+    def outdated(self, model: str) -> List[Dict[str, Any]]:
+        """Return the previous entries of the changed records of a model that were not exported again to the same
+        file with the same key, then forget about the previous entries of the model.
+        """
+        entries = self.models.get(model, {})
+        previous = self.previous.pop(model, {})
+
+        return [
+            entry
+            for key, entry in previous.items()
+            if (entries.get(key, {}).get("file"), entries.get(key, {}).get("key")) != (entry["file"], entry["key"])
+        ]
+
+    def update(self, model: str, res_id: int, **values: Any) -> None:
+        """Update the entry of an exported record with the version computed by `diff`.
+        :param model: The model of the record
+        :param res_id: The id of the record
+        :param values: The values of the entry, such as the `file` and `key` the record was merged into
+        """
+        entry = self.models.setdefault(model, {}).setdefault(str(res_id), {"file": "", "key": ""})
+        entry["version"] = self.versions.get(model, {}).get(res_id, "")
+
+        if isinstance(file := values.get("file"), Path):
+            values["file"] = file.relative_to(self.path).as_posix()
+
+        entry.update(values)
+
+    def entries(self, model: str) -> List[Dict[str, Any]]:
+        """Return the entries of the exported records of a model."""
+        return list(self.models.get(model, {}).values())
+
+    def save(self) -> None:
+        """Write the state to disk, replacing the state of the last export."""
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.file.parent, prefix=f"{self.file.stem}.", suffix=".tmp", delete=False
+        ) as f:
+            json.dump({"depends": self.depends, "models": self.models}, f, indent=1)
+
+        os.replace(f.name, self.file)
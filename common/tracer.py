@@ -0,0 +1,187 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from odev.common.logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Model, method, filtered fields with their operator and read fields of a call, regardless of the values
+CallShape = Tuple[str, str, Tuple[Tuple[str, str], ...], Tuple[str, ...]]
+
+
+class RpcBudgetExceeded(RuntimeError):
+    """Raised by the RPC calls made once the call budget of an export is spent."""
+
+
+class ShapeStats:
+    """Calls sharing the same shape."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.values = 0
+        self.latency = 0.0
+        self.response_size = 0
+
+
+class RpcTracer:
+    """Trace the RPC calls of an export and detect the query shapes issued in loops.
+
+    - Repeated calls are identical calls issued more than once, whose result could have been reused.
+    - N+1 patterns are calls with the same shape selecting a few records by id each, issued at least
+      `threshold` times, typically once per parent record or per chunk, which could have been issued
+      once for all ids.
+
+    A call budget can be set, the calls made once the budget is spent raise `RpcBudgetExceeded`.
+    """
+
+    def __init__(
+        self, log_calls: bool = False, budget: Optional[int] = None, threshold: int = 20, min_values: int = 10
+    ) -> None:
+        """Initialize the tracer.
+        :param log_calls: Whether every call is logged
+        :param budget: The maximum number of calls of the export, unlimited if `None`
+        :param threshold: The number of calls of the same shape from which they are flagged as a N+1 pattern
+        :param min_values: The average number of ids per call under which calls of the same shape are flagged
+        """
+        self.log_calls = log_calls
+        self.budget = budget
+        self.threshold = threshold
+        self.min_values = min_values
+        self.calls = 0
+        self.latency = 0.0
+        self.response_size = 0
+        self.shapes: Dict[CallShape, ShapeStats] = defaultdict(ShapeStats)
+        self.repeated: Counter = Counter()
+        self._signatures: Dict[str, CallShape] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.log_calls or self.budget is not None
+
+    def wrap(self, models: Any) -> Any:
+        """Wrap the RPC model proxies of a database to trace their calls."""
+        return TracedModels(self, models) if self.enabled else models
+
+    def call(self, model: str, method: str, func: Callable[..., Any], args: Sequence[Any], kwargs: Dict[str, Any]):
+        """Run and trace an RPC call.
+        :param model: The model called
+        :param method: The method called
+        :param func: The RPC method
+        :param args: The positional arguments of the call
+        :param kwargs: The keyword arguments of the call
+        :return: The result of the call
+        """
+        domain = args[0] if method == "search_read" and args else kwargs.get("domain", [])
+        fields = kwargs.get("fields") or (args[0] if method == "default_get" and args else [])
+        terms = [term for term in domain if isinstance(term, (list, tuple)) and len(term) == 3]
+        values = sum(len(term[2]) for term in terms if isinstance(term[2], (list, tuple, set)))
+        shape: CallShape = (model, method, tuple((str(t[0]), str(t[1])) for t in terms), tuple(sorted(fields or [])))
+        signature = hashlib.sha1(json.dumps([model, method, args, kwargs], default=str).encode()).hexdigest()
+
+        with self._lock:
+            self.calls += 1
+
+            if self.budget is not None and self.calls > self.budget:
+                raise RpcBudgetExceeded(f"RPC call budget of {self.budget} calls exceeded, on {method} of {model}")
+
+            self.repeated[signature] += 1
+            self._signatures[signature] = shape
+
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        latency = time.perf_counter() - start
+        size = len(json.dumps(result, default=str))
+
+        with self._lock:
+            self.latency += latency
+            self.response_size += size
+            stats = self.shapes[shape]
+            stats.calls += 1
+            stats.values += values
+            stats.latency += latency
+            stats.response_size += size
+
+        if self.log_calls:
+            logger.info(
+                f"RPC {method} on {model}: domain of {len(terms)} terms ({values} values), "
+                f"{len(fields) if fields else 'all'} fields, {latency * 1000:.0f} ms, {size} bytes"
+            )
+
+        return result
+
+    def n_plus_one(self) -> List[Tuple[CallShape, ShapeStats]]:
+        """List the shapes of calls issued in a loop, the most frequent first."""
+        return sorted(
+            (
+                (shape, stats)
+                for shape, stats in self.shapes.items()
+                if any(operator == "in" for _, operator in shape[2])
+                and stats.calls >= self.threshold
+                and stats.values / stats.calls < self.min_values
+            ),
+            key=lambda item: -item[1].calls,
+        )
+
+    def report(self, limit: int = 10) -> None:
+        """Log the number of calls of the export and the repeated calls and N+1 patterns detected.
+        :param limit: The maximum number of repeated calls and N+1 patterns logged
+        """
+        if not self.enabled:
+            return
+
+        logger.info(
+            f"{self.calls} RPC calls, {self.latency:.2f} s, {self.response_size / 1024 / 1024:.1f} MiB received"
+            + (f", budget of {self.budget} calls" if self.budget is not None else "")
+        )
+
+        repeated = [(self._signatures[signature], count) for signature, count in self.repeated.items() if count > 1]
+
+        for (model, method, _terms, _fields), count in sorted(repeated, key=lambda item: -item[1])[:limit]:
+            logger.warning(f"Repeated RPC call: {method} on {model} issued {count} times with the same arguments")
+
+        for (model, method, terms, _fields), stats in self.n_plus_one()[:limit]:
+            domain = ", ".join(f"{field} {operator}" for field, operator in terms)
+            logger.warning(
+                f"N+1 RPC calls: {stats.calls} {method} on {model} by [{domain}], "
+                f"{stats.values / stats.calls:.1f} values per call, {stats.latency:.2f} s in total"
+            )
+
+
+class TracedModels:
+    """Mapping of model names to RPC proxies tracing their calls."""
+
+    def __init__(self, tracer: RpcTracer, models: Any) -> None:
+        self.tracer = tracer
+        self.models = models
+
+    def __getitem__(self, model: str) -> "TracedModel":
+        return TracedModel(self.tracer, model, self.models[model])
+
+
+class TracedModel:
+    """RPC proxy of a model tracing its calls."""
+
+    def __init__(self, tracer: RpcTracer, name: str, model: Any) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.model = model
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        def call(*args, **kwargs):
+            return self.tracer.call(self.name, method, getattr(self.model, method), args, kwargs)
+
+        return call